@@ -1,628 +1,888 @@
-import streamlit as st
-import openai
-import os
-import sys
-# --- Replaced ReportLab imports with xhtml2pdf imports ---
-from xhtml2pdf import pisa
-from io import BytesIO
-
-# Define constants for styling (used within the generated HTML/CSS)
-BLUE = '#007bff'
-DARK_BLUE = '#0056b3'
-TEAL = '#00cba9'
-GREY = '#646464'
-
-# --- Configuration and Utility Functions ---
-
-# If this file is executed directly... (Existing code block)
-try:
-    from streamlit.runtime.scriptrunner import script_run_context as _script_ctx
-    if _script_ctx.get_script_run_ctx() is None:
-        print("This is a Streamlit app. Start it with: streamlit run app.py")
-        sys.exit(0)
-except Exception:
-    pass
-
-# Small utility: validate the OpenAI API key
-
-
-def validate_api_key():
-    """Validate the configured OpenAI API key using a low-cost API call.
-    Returns (ok: bool, message: str).
-    """
-    # Key fetching logic remains the same
-    key = os.getenv("OPENAI_API_KEY")
-    try:
-        if not key and hasattr(st, "secrets"):
-            key = st.secrets.get("OPENAI_API_KEY")
-    except Exception:
-        pass
-
-    if not key:
-        return False, "No API key found in environment or Streamlit secrets."
-
-    try:
-        # Prioritize new SDK
-        from openai import OpenAI
-        client = OpenAI(api_key=key)
-        client.models.list()
-        return True, "OpenAI API key is valid (new client)."
-    except Exception as e:
-        # Fallback to old SDK
-        try:
-            openai.api_key = key
-            openai.Model.list()
-            return True, "OpenAI API key is valid (old client)."
-        except Exception as e_old:
-            msg = f"Validation failed. Error: {e if 'openai' in str(e) else e_old}"
-            return False, msg
-
-# Function to generate text using the OpenAI API
-
-
-def generate_text(prompt, max_tokens_override=None, mock=False):
-    """Generates text using the OpenAI API."""
-    if mock:
-        return f"(MOCK) Generated content for prompt preview. Prompt starts: {prompt[:120]}..."
-
-    if max_tokens_override is None:
-        max_tokens_override = 1000
-
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    try:
-        if not openai_api_key and hasattr(st, "secrets"):
-            openai_api_key = st.secrets.get("OPENAI_API_KEY")
-    except Exception:
-        openai_api_key = openai_api_key
-
-    if not openai_api_key:
-        st.error(
-            "OpenAI API key not found. Please add your key as an environment variable or in Streamlit secrets.")
-        # Removed detailed key debugging instructions to keep code focused and clean
-        return None
-
-    try:
-        # API call logic remains the same (handles both old and new SDK)
-        try:
-            from openai import OpenAI
-            client = OpenAI(api_key=openai_api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens_override,
-                temperature=0.7,
-            )
-        except Exception:
-            openai.api_key = openai_api_key
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens_override,
-                n=1,
-                stop=None,
-                temperature=0.7,
-            )
-
-        if response and getattr(response, "choices", None):
-            choice = response.choices[0]
-            content = None
-            if isinstance(choice, dict):
-                content = choice.get("message", {}).get("content")
-            else:
-                content = getattr(
-                    getattr(choice, "message", None), "content", None)
-
-            if content:
-                return content.strip()
-
-        st.error("OpenAI returned an unexpected response format.")
-        return None
-    except Exception as e:
-        st.error(f"Error generating text: {e}")
-        return None
-
-
-# PDF Generator using xhtml2pdf (HTML to PDF)
-def create_full_pdf(user_info, generated_content, structured_projects):
-    """
-    Generates a comprehensive PDF byte stream by converting styled HTML using xhtml2pdf.
-    This method is highly compatible and avoids native library issues.
-    """
-
-    # --- CSS Styles (Embedded in HTML) ---
-    css = f"""
-    @page {{
-        size: letter;
-        margin: 0.75in;
-    }}
-    body {{ 
-        font-family: Helvetica, sans-serif; 
-        font-size: 11pt; 
-        color: #2c3e50; 
-        line-height: 1.4;
-    }}
-    h1 {{ 
-        color: {BLUE}; 
-        font-size: 18pt; 
-        text-align: center; 
-        margin-bottom: 5pt; 
-    }}
-    .contact {{ 
-        font-size: 10pt; 
-        color: {GREY}; 
-        text-align: center; 
-        margin-bottom: 15pt; 
-    }}
-    .separator {{ 
-        border-bottom: 2px solid {BLUE}; 
-        margin-top: 10pt; 
-        margin-bottom: 10pt; 
-    }}
-    .section-title {{
-        color: {DARK_BLUE};
-        font-size: 14pt;
-        font-weight: bold;
-        margin-top: 15pt;
-        margin-bottom: 5pt;
-        border-bottom: 1px solid #ddd;
-        padding-bottom: 3pt;
-    }}
-    .project-title {{
-        color: {TEAL};
-        font-size: 12pt;
-        font-weight: bold;
-        margin-top: 10pt;
-    }}
-    .project-link {{ font-style: italic; color: #0000ff; font-size: 10pt; }}
-    /* Important for Unicode bullet points and standard text */
-    ul {{ list-style-type: disc; margin-left: 15pt; margin-top: 5pt; padding-left: 0; }}
-    ul li {{ margin-bottom: 5px; }}
-    p {{ margin-top: 0; margin-bottom: 5pt; }}
-    """
-
-    # --- Header Construction ---
-    header_html = f"""
-    <h1>{user_info['name']}</h1>
-    <p class="contact">{user_info['contact']}</p>
-    <div class="separator"></div>
-    """
-
-    # --- Content Assembly ---
-    content_html = ""
-
-    # Helper to convert AI markdown content (which uses *, -, and # for headings/lists) to HTML
-    def markdown_to_html(markdown_text):
-        parts = []
-        in_list = False
-
-        for line in markdown_text.split('\n'):
-            line = line.strip()
-            if not line:
-                if in_list:
-                    parts.append('</ul>')
-                    in_list = False
-                continue
-
-            if line.startswith('*') or line.startswith('-'):
-                item_text = line.lstrip('*- ').strip()
-                if not in_list:
-                    parts.append('<ul>')
-                    in_list = True
-                parts.append(f'<li>{item_text}</li>')
-            elif line.startswith('###'):
-                if in_list:
-                    parts.append('</ul>')
-                    in_list = False
-                parts.append(
-                    f'<div class="project-title">{line.lstrip("# ").strip()}</div>')
-            elif line.startswith('##') or line.startswith('#'):
-                if in_list:
-                    parts.append('</ul>')
-                    in_list = False
-                # Use standard section title style defined in CSS
-                parts.append(
-                    f'<div class="section-title">{line.lstrip("# ").strip()}</div>')
-            else:
-                if in_list:
-                    parts.append('</ul>')
-                    in_list = False
-                parts.append(f'<p>{line}</p>')
-
-        if in_list:
-            parts.append('</ul>')
-
-        return '\n'.join(parts)
-
-    # 1. AI Generated Portfolio Summary (HTML from markdown)
-    content_html += '<div class="section-title" style="margin-top: 5pt;">AI-Generated Portfolio Summary</div>'
-    if generated_content.get('portfolio'):
-        content_html += markdown_to_html(generated_content['portfolio'])
-
-    # 2. Core Experience and Skills (Raw User Input)
-    content_html += '<div class="section-title">Core Skills & Experience Summary</div>'
-
-    # Skills
-    skills_list = ', '.join(user_info["skills"])
-    content_html += f'<p><b>Skills:</b> {skills_list}</p>'
-
-    # Experience
-    content_html += '<p><b>Experience:</b></p>'
-    experience_list_items = "".join([
-        f'<li>{exp}</li>' for exp in user_info['experience']
-    ])
-    if experience_list_items:
-        content_html += f'<ul class="experience-list">{experience_list_items}</ul>'
-
-    # 3. Detailed Portfolio Projects (Structured Data)
-    if structured_projects:
-        content_html += '<div class="section-title">Detailed Projects</div>'
-        for p in structured_projects:
-            if p['title']:
-                content_html += f'<div class="project-title">{p["title"]}</div>'
-
-                # Link
-                if p['link']:
-                    content_html += f'<p class="project-link">Link: <a href="{p["link"]}">{p["link"]}</a></p>'
-
-                # Description
-                if p['description']:
-                    content_html += f'<p>{p["description"]}</p>'
-
-    # 4. AI Generated Resume Summary (as an appendix)
-    if generated_content.get('resume'):
-        content_html += '<div class="section-title">AI-Generated Resume Highlights</div>'
-        content_html += markdown_to_html(generated_content['resume'])
-
-    # 5. Full HTML document assembly
-    full_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{user_info['name']} Portfolio</title>
-        <!-- Explicitly declare UTF-8 charset for robust Unicode handling -->
-        <meta charset="UTF-8"/>
-        <style>{css}</style>
-    </head>
-    <body>
-        {header_html}
-        {content_html}
-    </body>
-    </html>
-    """
-
-    # 6. Convert HTML to PDF using pisa
-    buffer = BytesIO()
-    try:
-        # Create a PDF object from the HTML string
-        pisa_status = pisa.CreatePDF(
-            full_html,
-            dest=buffer
-        )
-
-        if pisa_status.err:
-            st.error(
-                "Error creating PDF using xhtml2pdf. Check the HTML content or library installation.")
-            return BytesIO()
-
-        buffer.seek(0)
-        return buffer
-    except ImportError:
-        st.error(
-            "The `xhtml2pdf` library is required but not installed. Please run: `pip install xhtml2pdf`")
-        return BytesIO()
-    except Exception as e:
-        st.error(
-            f"An unexpected error occurred during PDF generation (xhtml2pdf): {e}")
-        return BytesIO()
-
-
-# --- CSS Styling (Enhanced) ---
-css_style = """
-<style>
-/* 1. Global/Body Styles */
-body {
-    font-family: 'Inter', sans-serif;
-    color: #2c3e50; /* Darker text */
-    background-color: #f8f9fa;
-}
-
-/* 2. Container Styling */
-.stApp {
-    max-width: 1000px;
-    padding-top: 2rem;
-    padding-bottom: 2rem;
-}
-
-/* 3. Headers */
-h1 {
-    color: #007bff; /* Primary blue for main header */
-    text-align: center;
-    border-bottom: 3px solid #007bff;
-    padding-bottom: 10px;
-    margin-bottom: 20px;
-}
-h2 {
-    color: #0056b3; /* Darker blue for subheaders */
-    border-left: 5px solid #00cba9; /* Teal accent */
-    padding-left: 10px;
-    margin-top: 15px;
-}
-
-/* 4. Generated Content Display */
-.generated-content {
-    background-color: #ffffff;
-    border-radius: 12px;
-    padding: 20px;
-    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-    margin-bottom: 20px;
-}
-
-.resume-section { border: 1px solid #e0f7fa; }
-.cover-letter-section { border: 1px solid #ffe0b2; }
-.portfolio-section { border: 1px solid #c8e6c9; }
-
-/* 5. Buttons and Inputs */
-.stButton>button {
-    background-color: #00cba9; /* Teal button */
-    color: white;
-    border-radius: 8px;
-    padding: 10px 20px;
-    font-weight: bold;
-    transition: background-color 0.3s;
-}
-.stButton>button:hover {
-    background-color: #00a892; /* Darker teal on hover */
-}
-</style>
-"""
-st.markdown(css_style, unsafe_allow_html=True)
-
-# --- Streamlit UI Layout ---
-
-st.title("AI-Powered Resume, Cover Letter, and Portfolio Generator 🤖")
-
-# Use st.columns for better input layout
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("Personal Information")
-    user_name = st.text_input(
-        "Name (for letters/resumes)", "John Doe", key="user_name")
-    user_contact = st.text_input(
-        "Email/Phone/Location", "john.doe@example.com | (555) 123-4567", key="user_contact")
-
-st.subheader("Enter Your Core Data")
-skills = st.text_area("Skills (comma-separated)",
-                      "Python, Data Analysis, Machine Learning, Streamlit, SQL", key="user_skills")
-projects_text = st.text_area("Projects (list each *brief* project name on a new line)",
-                             "AI Job Generator, eCommerce Dashboard, Personal Blog", key="user_projects_text")
-experience = st.text_area("Experience (list each job/role on a new line)",
-                          "Senior Data Scientist at TechCorp (2020-Present), ML Intern at Innovate Solutions (2019)", key="user_experience")
-
-st.subheader("Customization Options")
-col_opt1, col_opt2, col_opt3 = st.columns(3)
-
-with col_opt1:
-    resume_template = st.selectbox("Select Resume Template", [
-                                   "Classic", "Modern", "Creative"], key="resume_template")
-with col_opt2:
-    tone = st.radio("Preferred Tone", [
-                    "Professional", "Creative", "Enthusiastic"], key="tone")
-with col_opt3:
-    max_tokens = st.number_input(
-        "Max tokens", min_value=50, max_value=2000, value=1000, step=50, help="Controls the length of AI output.", key="max_tokens")
-
-# Workaround controls when OpenAI quota is exhausted
-use_mock = st.checkbox(
-    "Use mock responses (no OpenAI calls)", value=False, key="use_mock")
-if use_mock:
-    st.warning("Mock mode is ON. Content will be placeholder text.")
-
-# API Key Validation Button (outside the main flow)
-if st.button("Validate OpenAI API Key 🔑"):
-    with st.spinner("Validating API key..."):
-        ok, message = validate_api_key()
-        if ok:
-            st.success(message)
-        else:
-            st.error(message)
-
-st.divider()
-
-# --- Portfolio Projects Tab (for structured data) ---
-
-# Use tabs to separate complex input from output
-tabs = st.tabs(["**Portfolio Project Details** 🖼️", "**Generated Content** ✨"])
-
-# Initialize session state for project data
-if 'project_data' not in st.session_state:
-    st.session_state.project_data = []
-
-with tabs[0]:
-    st.subheader("Detailed Portfolio Projects (Optional)")
-    st.info("Use this section to add structured details (links) for a comprehensive PDF portfolio.")
-
-    num_projects = st.number_input("Number of Detailed Projects", min_value=0, value=len(
-        st.session_state.project_data), step=1, key="num_projects")
-
-    # Dynamic list management
-    if num_projects > len(st.session_state.project_data):
-        for _ in range(num_projects - len(st.session_state.project_data)):
-            st.session_state.project_data.append(
-                {"title": "", "description": "", "link": "", "image": None})
-    elif num_projects < len(st.session_state.project_data):
-        st.session_state.project_data = st.session_state.project_data[:num_projects]
-
-    for i in range(num_projects):
-        # Use a unique key for each file uploader based on its index
-        image_key = f"project_image_{i}_uploader"
-        # Preserve existing image if possible
-        current_image = st.session_state.project_data[i].get("image")
-
-        with st.container(border=True):  # Use a container for visual grouping
-            st.markdown(f"#### Project {i+1}")
-            st.session_state.project_data[i]["title"] = st.text_input(
-                f"Project {i+1} Title", value=st.session_state.project_data[i]["title"], key=f"project_title_{i}")
-            st.session_state.project_data[i]["description"] = st.text_area(
-                f"Project {i+1} Description", value=st.session_state.project_data[i]["description"], key=f"project_description_{i}")
-            st.session_state.project_data[i]["link"] = st.text_input(
-                f"Project {i+1} Link (URL)", value=st.session_state.project_data[i]["link"], key=f"project_link_{i}")
-
-            # File Uploader
-            uploaded_file = st.file_uploader(
-                f"Upload Image for Project {i+1} (Preview Only)", type=["png", "jpg", "jpeg"], key=image_key)
-
-            # Update session state with the new uploaded file or keep the old one
-            if uploaded_file is not None:
-                st.session_state.project_data[i]["image"] = uploaded_file
-            elif current_image is None and uploaded_file is None:
-                # Ensure 'image' key is handled if user removes it or if it was never set
-                st.session_state.project_data[i]["image"] = None
-
-            # Preview uploaded image
-            if st.session_state.project_data[i]["image"] is not None:
-                st.image(st.session_state.project_data[i]["image"],
-                         caption=f"Image preview for {st.session_state.project_data[i]['title'] or f'Project {i+1}'}", width=250)
-                st.caption(
-                    "Note: Images are *not* included in the PDF download (due to xhtml2pdf complexity) but are here for reference.")
-
-# --- State Management for Generated Content ---
-if 'generated_resume' not in st.session_state:
-    st.session_state.generated_resume = None
-if 'generated_cover_letter' not in st.session_state:
-    st.session_state.generated_cover_letter = None
-if 'generated_portfolio' not in st.session_state:
-    st.session_state.generated_portfolio = None
-
-# --- Generate Button and Output Tab ---
-with tabs[1]:
-    generate_button = st.button("Generate Content 🚀", type="primary")
-
-    # Containers for generated output (will be filled after generation)
-    resume_output_container = st.empty()
-    cover_letter_output_container = st.empty()
-    portfolio_output_container = st.empty()
-
-    if generate_button:
-        # 1. Process Input Data
-        user_skills = st.session_state.user_skills
-        user_projects_text = st.session_state.user_projects_text
-        user_experience = st.session_state.user_experience
-
-        processed_skills = [skill.strip()
-                            for skill in user_skills.split(',') if skill.strip()]
-        processed_projects_text_list = [
-            project.strip() for project in user_projects_text.split('\n') if project.strip()]
-        processed_experience = [
-            exp.strip() for exp in user_experience.split('\n') if exp.strip()]
-
-        # Include structured project details for AI context
-        all_projects_for_ai = processed_projects_text_list + \
-            [f"{p['title']}: {p['description']}" for p in st.session_state.project_data if p["title"] or p["description"]]
-
-        if not all_projects_for_ai and not processed_skills and not processed_experience:
-            st.warning(
-                "Please enter some skills, experience, or projects before generating content.")
-        else:
-            # 2. Define Prompts (Same as before)
-            resume_prompt = f"""Generate a professional resume summary and 3-5 key bullet points for the experience section based on:
-Skills: {', '.join(processed_skills)}
-Projects: {'; '.join(all_projects_for_ai)}
-Experience: {'; '.join(processed_experience)}
-Template: {st.session_state.resume_template}. Tone: {st.session_state.tone}.
-Format the output using markdown headings and bullet points.
-"""
-            cover_letter_prompt = f"""Write a compelling cover letter introduction and 3 core paragraphs (targeting an unspecified but relevant job) based on:
-Skills: {', '.join(processed_skills)}. Projects: {'; '.join(all_projects_for_ai)}. Experience: {'; '.join(processed_experience)}.
-Desired Tone: {st.session_state.tone}. Start with a placeholder greeting (e.g., Dear Hiring Manager,).
-Format the output using markdown paragraphs.
-"""
-            portfolio_prompt = f"""Create a concise portfolio summary (about 100 words) and a list of 3 featured project highlights based on:
-Skills: {', '.join(processed_skills)}. Experience: {'; '.join(processed_experience)}. Projects: {'; '.join(all_projects_for_ai)}.
-Desired Tone: {st.session_state.tone}.
-Format the output using markdown headings and lists.
-"""
-
-            # 3. Generate Content
-            with st.spinner("Generating content..."):
-                st.session_state.generated_resume = generate_text(
-                    resume_prompt, max_tokens_override=st.session_state.max_tokens, mock=st.session_state.use_mock)
-                st.session_state.generated_cover_letter = generate_text(
-                    cover_letter_prompt, max_tokens_override=st.session_state.max_tokens, mock=st.session_state.use_mock)
-                st.session_state.generated_portfolio = generate_text(
-                    portfolio_prompt, max_tokens_override=st.session_state.max_tokens, mock=st.session_state.use_mock)
-
-            # 4. Display Feedback
-            if st.session_state.generated_resume and st.session_state.generated_cover_letter and st.session_state.generated_portfolio:
-                st.balloons()
-                st.toast('Content Generated Successfully!', icon='🎉')
-
-    # --- Display Content and Download Buttons (Executed on every run) ---
-    st.subheader("Generated Content")
-
-    # Check if content exists (either generated or from session state after refresh)
-    if st.session_state.generated_resume:
-        styled_resume = f'<div class="generated-content resume-section"><h3>Generated Resume</h3>{st.session_state.generated_resume}</div>'
-        resume_output_container.markdown(styled_resume, unsafe_allow_html=True)
-        st.download_button(
-            label="Download Resume (Text)",
-            data=st.session_state.generated_resume,
-            file_name="resume.txt",
-            mime="text/plain",
-            key="download_resume"
-        )
-
-    if st.session_state.generated_cover_letter:
-        styled_cover_letter = f'<div class="generated-content cover-letter-section"><h3>Generated Cover Letter</h3>{st.session_state.generated_cover_letter}</div>'
-        cover_letter_output_container.markdown(
-            styled_cover_letter, unsafe_allow_html=True)
-        st.download_button(
-            label="Download Cover Letter (Text)",
-            data=st.session_state.generated_cover_letter,
-            file_name="cover_letter.txt",
-            mime="text/plain",
-            key="download_cover_letter"
-        )
-
-    if st.session_state.generated_portfolio:
-        styled_portfolio = f'<div class="generated-content portfolio-section"><h3>Generated Portfolio Summary</h3>{st.session_state.generated_portfolio}</div>'
-        portfolio_output_container.markdown(
-            styled_portfolio, unsafe_allow_html=True)
-
-        # --- FULL PDF DOWNLOAD OPTION ---
-
-        # 1. Prepare Data for PDF Function
-        pdf_user_info = {
-            'name': st.session_state.user_name,
-            'contact': st.session_state.user_contact,
-            # Processed skills/experience are needed for the PDF
-            'skills': [skill.strip() for skill in st.session_state.user_skills.split(',') if skill.strip()],
-            'experience': [exp.strip() for exp in st.session_state.user_experience.split('\n') if exp.strip()]
-        }
-        pdf_generated_content = {
-            'portfolio': st.session_state.generated_portfolio,
-            'resume': st.session_state.generated_resume
-        }
-
-        # Filter project data to only include text/link info
-        pdf_structured_projects = [
-            {'title': p['title'], 'description': p['description'],
-                'link': p['link']}
-            for p in st.session_state.project_data if p['title']
-        ]
-
-        # 2. Generate the PDF
-        pdf_data = create_full_pdf(
-            pdf_user_info, pdf_generated_content, pdf_structured_projects)
-
-        # 3. Create the Download Button
-        st.download_button(
-            label="Download COMPLETE Portfolio (PDF) 📥",
-            data=pdf_data,
-            file_name=f"{st.session_state.user_name.replace(' ', '_')}_Full_Portfolio.pdf",
-            mime="application/pdf",
-            key="download_full_portfolio_pdf"
-        )
-
-        st.info("The generated PDF is styled professionally and includes your core data, detailed projects, and all AI-generated text.")
-
+import streamlit as st
+import os
+import sys
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import time
+import json
+import uuid
+import hmac
+
+import generation
+from blob_store import SessionBlobs, get_blob_store
+from candidate_profile import Project, parse_profile
+from health import HEALTH_PROBE_ENABLED, get_health_probe, start_health_probe
+from images import ImageProcessingError, get_thumbnail, get_thumbnail_cache
+from job_queue import CANCELLED, DONE, FAILED, JOB_QUEUE_PATH, QUEUED, JobQueue
+from metrics import METRICS, record_cancellation, record_pdf_render, start_file_exporter
+from pdf_export import DEFAULT_PDF_BACKEND, PDF_BACKENDS, PdfRenderCache, PdfRenderError, pdf_content_key, render_full_pdf, render_full_pdf_with_timings
+from prompts import DOCUMENT_NAMES, document_fingerprints
+from token_budget import PROMPT_PROJECT_TOKEN_BUDGET, count_tokens, document_max_tokens, estimate_usage
+
+# PDF render cache bounds (rendered PDFs are kept in process memory)
+PDF_RENDER_CACHE_MAX_ENTRIES = int(
+    os.getenv("PDF_RENDER_CACHE_MAX_ENTRIES", "32"))
+PDF_RENDER_CACHE_MAX_BYTES = int(
+    os.getenv("PDF_RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Background PDF rendering (pisa is CPU-bound, so it runs in worker processes)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_JOB_POLL_SECONDS = 0.5
+
+# Background generation jobs (see job_queue.py); the page polls them at this interval
+GENERATION_JOB_POLL_SECONDS = 1.0
+
+# Metrics: optional admin panel and periodic export for scraping
+ADMIN_PANEL_ENABLED = os.getenv("APP_ADMIN_PANEL", "").lower() in ("1", "true", "yes")
+# With a token set, ?admin=<token> shows the panel in a single browser session
+ADMIN_PANEL_TOKEN = os.getenv("APP_ADMIN_TOKEN")
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+METRICS_EXPORT_INTERVAL_SECONDS = float(
+    os.getenv("METRICS_EXPORT_INTERVAL_SECONDS", "15"))
+
+# --- Configuration and Utility Functions ---
+
+# If this file is executed directly... (Existing code block)
+try:
+    from streamlit.runtime.scriptrunner import script_run_context as _script_ctx
+    if _script_ctx.get_script_run_ctx() is None:
+        print("This is a Streamlit app. Start it with: streamlit run app.py")
+        print("For headless batch generation use: python batch.py --help")
+        sys.exit(0)
+except Exception:
+    pass
+
+# API key lookup (environment first, then Streamlit secrets)
+
+
+def _get_openai_api_key():
+    """Returns the OpenAI API key from the environment or Streamlit secrets."""
+    openai_api_key = generation.get_openai_api_key()
+    try:
+        if not openai_api_key and hasattr(st, "secrets"):
+            openai_api_key = st.secrets.get("OPENAI_API_KEY")
+    except Exception:
+        openai_api_key = openai_api_key
+    return openai_api_key
+
+# Small utility: validate the OpenAI API key
+
+
+def validate_api_key(force=False):
+    """Validate the configured OpenAI API key using a low-cost API call.
+    Results are shared by all sessions for a while; `force` skips that cache.
+    Returns (ok: bool, message: str).
+    """
+    with METRICS.timer("api_key_validation_seconds"):
+        ok, message = _validate_api_key(force)
+    METRICS.increment("api_key_validations_total",
+                      result="valid" if ok else "invalid")
+    return ok, message
+
+
+def _validate_api_key(force=False):
+    key = _get_openai_api_key()
+    if not key:
+        return False, "No API key found in environment or Streamlit secrets."
+
+    ok, message, cached = generation.validate_api_key(key, use_cache=not force)
+    if cached:
+        message += " (recently checked)"
+    return ok, message
+
+
+def render_provider_status():
+    """Shows the latest background health probe result, if the probe is running."""
+    probe = get_health_probe()
+    if probe is None:
+        return
+    status = probe.status()
+    icon = {"ok": "🟢", "degraded": "🟡", "down": "🔴"}.get(status["state"], "⚪")
+    text = f"{icon} OpenAI status: {status['state']}"
+    if status["latency_seconds"] is not None:
+        text += f" ({status['latency_seconds'] * 1000:.0f} ms"
+        text += f", checked {time.time() - status['checked_at']:.0f}s ago)"
+    st.caption(text, help=status["message"])
+
+
+def generate_texts_concurrently(prompts, max_tokens_override=None, mock=False, use_cache=True):
+    """Generates several documents at once; see `generation.generate_documents`.
+
+    `max_tokens_override` may be a single limit or a `{name: limit}` dict.
+    """
+    return generation.generate_documents(
+        prompts, None if mock else _get_openai_api_key(),
+        max_tokens=max_tokens_override, mock=mock, use_cache=use_cache)
+
+
+def generate_texts_single_call(combined_prompt, prompts, max_tokens_override=None, mock=False, use_cache=True):
+    """Generates all documents in one structured request; see `generation.generate_documents_single_call`."""
+    return generation.generate_documents_single_call(
+        combined_prompt, prompts, None if mock else _get_openai_api_key(),
+        max_tokens=max_tokens_override, mock=mock, use_cache=use_cache)
+
+
+def stream_texts_concurrently(prompts, on_update, max_tokens_override=None, mock=False, use_cache=True):
+    """Streams several documents at once; see `generation.stream_documents`."""
+    return generation.stream_documents(
+        prompts, on_update, None if mock else _get_openai_api_key(),
+        max_tokens=max_tokens_override, mock=mock, use_cache=use_cache)
+
+
+# PDF Generator (xhtml2pdf HTML conversion or direct reportlab layout)
+def create_full_pdf(user_info, generated_content, structured_projects, backend=None):
+    """
+    Generates a comprehensive PDF byte stream with the chosen backend (see pdf_export.PDF_BACKENDS).
+    The default converts styled HTML using xhtml2pdf, which is highly compatible and avoids native library issues.
+    """
+    backend = backend or DEFAULT_PDF_BACKEND
+    try:
+        timings = {}
+        pdf_bytes = render_full_pdf(
+            user_info, generated_content, structured_projects, timings, backend)
+        record_pdf_render(timings, len(pdf_bytes))
+        return BytesIO(pdf_bytes)
+    except PdfRenderError as e:
+        st.error(str(e))
+        return BytesIO()
+    except ImportError as e:
+        package = (e.name or backend).split(".")[0]
+        st.error(
+            f"The `{package}` library is required but not installed. Please run: `pip install {package}`")
+        return BytesIO()
+    except Exception as e:
+        st.error(
+            f"An unexpected error occurred during PDF generation ({backend}): {e}")
+        return BytesIO()
+
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_render_cache():
+    """Returns the process-wide PDF render cache shared by all sessions."""
+    return PdfRenderCache(PDF_RENDER_CACHE_MAX_ENTRIES, PDF_RENDER_CACHE_MAX_BYTES)
+
+
+def create_full_pdf_cached(key, profile, generated_content, backend=None):
+    """Returns the PDF bytes for `key` (a `pdf_content_key`), rendering only on a cache miss.
+
+    Streamlit reruns the script on every widget interaction; with this cache
+    the PDF is only rebuilt when its inputs actually change. Failed (empty)
+    renders are not cached.
+    """
+    cache = get_pdf_render_cache()
+    data = cache.get(key)
+    if data is None:
+        data = create_full_pdf(
+            profile.pdf_user_info(), generated_content,
+            profile.pdf_projects(get_session_blobs().get), backend).getvalue()
+        if data:
+            cache.set(key, data)
+    return data
+
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_executor():
+    """Returns the process pool used for on-demand PDF rendering.
+
+    Worker processes are started with "spawn" so they do not inherit the
+    server's threads, and one user's PDF build does not hold the GIL of the
+    process serving every other session.
+    """
+    return ProcessPoolExecutor(
+        max_workers=PDF_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def submit_pdf_render(key, profile, generated_content, backend=None):
+    """Queues a background PDF render for `key` and returns a job dict for session state."""
+    backend = backend or DEFAULT_PDF_BACKEND
+    future = get_pdf_executor().submit(
+        render_full_pdf_with_timings, profile.pdf_user_info(), generated_content,
+        profile.pdf_projects(get_session_blobs().get), backend)
+    return {
+        "key": key,
+        "backend": backend,
+        "future": future,
+        "started": time.time(),
+    }
+
+
+@st.fragment(run_every=PDF_JOB_POLL_SECONDS)
+def pdf_job_status():
+    """Polls the session's background PDF job and shows its progress.
+
+    Only this fragment reruns while the job is pending; once it finishes the
+    bytes go into the shared render cache and the full page reruns to show
+    the download button.
+    """
+    job = st.session_state.get("pdf_job")
+    if job is None:
+        return
+
+    future = job["future"]
+    if not future.done():
+        state = "Rendering" if future.running() else "Waiting for a free PDF worker"
+        st.info(
+            f"⏳ {state}... ({time.time() - job['started']:.1f}s elapsed)")
+        return
+
+    st.session_state.pdf_job = None
+    try:
+        pdf_bytes, timings = future.result()
+        timings["total_with_queue"] = time.time() - job["started"]
+        record_pdf_render(timings, len(pdf_bytes))
+        get_pdf_render_cache().set(job["key"], pdf_bytes)
+    except Exception as e:
+        st.session_state.pdf_job_error = f"An unexpected error occurred during PDF generation ({job['backend']}): {e}"
+    st.rerun()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Returns the process-wide generation job queue with its worker threads running.
+
+    Jobs are stored in SQLite, so a job outlives the script run (and the
+    browser connection) that queued it; any session that knows the job id
+    can pick up the result.
+    """
+    def _handler(payload, report_progress, cancel_event):
+        openai_api_key = None if payload.get("mock") else _get_openai_api_key()
+        return generation.run_generation_job(payload, report_progress, openai_api_key, cancel_event)
+
+    queue = JobQueue(JOB_QUEUE_PATH, _handler)
+    queue.start()
+    return queue
+
+
+def job_owner():
+    """Identifies this session for the job queue's per-user fairness."""
+    if "job_owner" not in st.session_state:
+        st.session_state.job_owner = uuid.uuid4().hex
+    return st.session_state.job_owner
+
+
+def apply_generation_results(results, fingerprints):
+    """Stores `{name: (text, error)}` results in session state and returns the error messages.
+
+    Each document lands in its own slot; one failure does not discard the others.
+    """
+    errors = []
+    for doc_name, (doc_text, doc_error) in results.items():
+        st.session_state[f"generated_{doc_name}"] = doc_text
+        if doc_error:
+            st.session_state.doc_fingerprints.pop(doc_name, None)
+            errors.append(f"{doc_name.replace('_', ' ').title()}: {doc_error}")
+        else:
+            st.session_state.doc_fingerprints[doc_name] = fingerprints[doc_name]
+    st.session_state.doc_status = {
+        name: "fresh" if name in results else "reused" for name in DOCUMENT_NAMES}
+    METRICS.increment("documents_reused_total",
+                      len(DOCUMENT_NAMES) - len(results))
+    return errors
+
+
+def forget_generation_job():
+    st.session_state.generation_job = None
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+
+def cancel_generation_job():
+    """Cancels the session's background job; a running one aborts its open streams.
+
+    A job that never left the queue saves its whole token estimate, which
+    is recorded here (running jobs record their own savings).
+    """
+    job_id = st.session_state.generation_job
+    job = get_job_queue().get(job_id)
+    if get_job_queue().cancel(job_id) and job is not None and job["status"] == QUEUED:
+        payload = job["payload"]
+        record_cancellation("queued", 0, sum(
+            count_tokens(prompt) +
+            generation.max_tokens_for(payload["max_tokens"], name)
+            for name, prompt in payload["prompts"].items()))
+    forget_generation_job()
+
+
+@st.fragment(run_every=GENERATION_JOB_POLL_SECONDS)
+def generation_job_status():
+    """Polls the session's background generation job and shows its progress.
+
+    The job id is also kept in the URL (`?job=`), so a page that reconnects
+    after a dropped connection picks the job up again. Once the job ends,
+    its results are applied and the full page reruns to show them.
+    """
+    job_id = st.session_state.get("generation_job")
+    if job_id is None:
+        return
+
+    job = get_job_queue().get(job_id)
+    if job is None:
+        forget_generation_job()
+        st.warning("The background generation job has expired; please generate again.")
+        return
+
+    if job["status"] not in (DONE, FAILED, CANCELLED):
+        elapsed = time.time() - job["created_at"]
+        if job["position"] is not None:
+            st.info(f"⏳ Queued for generation ({job['position']} job(s) ahead, {elapsed:.0f}s elapsed)")
+        else:
+            st.info(f"⏳ Generating in the background... ({elapsed:.0f}s elapsed)")
+        if st.button("Cancel generation", key="cancel_generation_job"):
+            cancel_generation_job()
+            st.rerun()
+        for doc_name, partial_text in (job["progress"] or {}).items():
+            st.markdown(f"**{doc_name.replace('_', ' ').title()}** (in progress)")
+            st.markdown(partial_text)
+        return
+
+    forget_generation_job()
+    if job["status"] == DONE:
+        st.session_state.generation_job_errors = apply_generation_results(
+            job["result"], job["payload"]["fingerprints"])
+    elif job["status"] == FAILED:
+        st.session_state.generation_job_errors = [
+            f"Background generation failed: {job['error']}"]
+    st.rerun()
+
+
+def get_session_blobs():
+    """Returns this session's spooled blob storage (freed when the session ends)."""
+    if "blobs" not in st.session_state:
+        st.session_state.blobs = SessionBlobs(get_blob_store())
+    return st.session_state.blobs
+
+
+def session_pdf(pdf_key):
+    """Returns the PDF this session last spooled, if it was rendered for `pdf_key`."""
+    if st.session_state.get("pdf_blob_key") != pdf_key:
+        return None
+    return get_session_blobs().get("portfolio.pdf")
+
+
+def spool_session_pdf(pdf_key, pdf_bytes):
+    """Keeps the session's current PDF on disk so it survives render cache eviction."""
+    if get_session_blobs().put("portfolio.pdf", pdf_bytes):
+        st.session_state.pdf_blob_key = pdf_key
+
+
+def current_profile():
+    """Returns the candidate profile for the current inputs, parsed only when they change."""
+    return parse_profile(
+        st.session_state.user_name, st.session_state.user_contact,
+        st.session_state.user_skills, st.session_state.user_projects_text,
+        st.session_state.user_experience,
+        tuple(Project(p["title"], p["description"], p["link"], p.get("image"), p.get("image_digest"))
+              for p in st.session_state.project_data),
+        st.session_state.resume_template, st.session_state.tone)
+
+
+def admin_token_given():
+    """Returns True if the URL carries the configured admin token."""
+    given = st.query_params.get("admin")
+    return bool(ADMIN_PANEL_TOKEN and given) and hmac.compare_digest(
+        given.encode("utf-8"), ADMIN_PANEL_TOKEN.encode("utf-8"))
+
+
+def render_admin_panel():
+    """Shows latency, token, retry and cache metrics plus export downloads."""
+    with st.expander("Admin: performance metrics", expanded=False):
+        snapshot = METRICS.snapshot()
+        st.markdown("**Timings** (seconds; PDF sizes in bytes)")
+        st.dataframe(snapshot["summaries"], use_container_width=True)
+        st.markdown("**Counters**")
+        st.dataframe(snapshot["counters"], use_container_width=True)
+        st.markdown("**Request scheduler / caches**")
+        st.json({
+            "scheduler": generation.get_request_scheduler().stats(),
+            "models": generation.get_model_router().stats(),
+            "completion_cache": generation.get_completion_cache().stats(),
+            "pdf_render_cache": get_pdf_render_cache().stats(),
+            "thumbnail_cache": get_thumbnail_cache().stats(),
+            "blob_store": get_blob_store().stats(),
+            "job_queue": get_job_queue().stats(),
+            "provider_health": get_health_probe().status() if get_health_probe() else None,
+        })
+        col_json, col_prom = st.columns(2)
+        with col_json:
+            st.download_button("Download metrics (JSON)", data=json.dumps(snapshot, indent=2),
+                               file_name="metrics.json", mime="application/json", key="download_metrics_json")
+        with col_prom:
+            st.download_button("Download metrics (Prometheus)", data=METRICS.to_prometheus(),
+                               file_name="metrics.prom", mime="text/plain", key="download_metrics_prom")
+        if METRICS_EXPORT_PATH:
+            st.caption(
+                f"Metrics are also written to {METRICS_EXPORT_PATH}.prom / .json every {METRICS_EXPORT_INTERVAL_SECONDS:g}s.")
+
+
+# --- CSS Styling (Enhanced) ---
+css_style = """
+<style>
+/* 1. Global/Body Styles */
+body {
+    font-family: 'Inter', sans-serif;
+    color: #2c3e50; /* Darker text */
+    background-color: #f8f9fa;
+}
+
+/* 2. Container Styling */
+.stApp {
+    max-width: 1000px;
+    padding-top: 2rem;
+    padding-bottom: 2rem;
+}
+
+/* 3. Headers */
+h1 {
+    color: #007bff; /* Primary blue for main header */
+    text-align: center;
+    border-bottom: 3px solid #007bff;
+    padding-bottom: 10px;
+    margin-bottom: 20px;
+}
+h2 {
+    color: #0056b3; /* Darker blue for subheaders */
+    border-left: 5px solid #00cba9; /* Teal accent */
+    padding-left: 10px;
+    margin-top: 15px;
+}
+
+/* 4. Generated Content Display */
+.generated-content {
+    background-color: #ffffff;
+    border-radius: 12px;
+    padding: 20px;
+    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
+    margin-bottom: 20px;
+}
+
+.resume-section { border: 1px solid #e0f7fa; }
+.cover-letter-section { border: 1px solid #ffe0b2; }
+.portfolio-section { border: 1px solid #c8e6c9; }
+
+/* 5. Buttons and Inputs */
+.stButton>button {
+    background-color: #00cba9; /* Teal button */
+    color: white;
+    border-radius: 8px;
+    padding: 10px 20px;
+    font-weight: bold;
+    transition: background-color 0.3s;
+}
+.stButton>button:hover {
+    background-color: #00a892; /* Darker teal on hover */
+}
+</style>
+"""
+st.markdown(css_style, unsafe_allow_html=True)
+
+if METRICS_EXPORT_PATH:
+    start_file_exporter(METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL_SECONDS)
+
+if HEALTH_PROBE_ENABLED:
+    start_health_probe(_get_openai_api_key)
+
+# --- Streamlit UI Layout ---
+
+st.title("AI-Powered Resume, Cover Letter, and Portfolio Generator 🤖")
+
+# Use st.columns for better input layout
+col1, col2 = st.columns(2)
+
+with col1:
+    st.subheader("Personal Information")
+    user_name = st.text_input(
+        "Name (for letters/resumes)", "John Doe", key="user_name")
+    user_contact = st.text_input(
+        "Email/Phone/Location", "john.doe@example.com | (555) 123-4567", key="user_contact")
+
+st.subheader("Enter Your Core Data")
+skills = st.text_area("Skills (comma-separated)",
+                      "Python, Data Analysis, Machine Learning, Streamlit, SQL", key="user_skills")
+projects_text = st.text_area("Projects (list each *brief* project name on a new line)",
+                             "AI Job Generator, eCommerce Dashboard, Personal Blog", key="user_projects_text")
+experience = st.text_area("Experience (list each job/role on a new line)",
+                          "Senior Data Scientist at TechCorp (2020-Present), ML Intern at Innovate Solutions (2019)", key="user_experience")
+
+st.subheader("Customization Options")
+col_opt1, col_opt2, col_opt3 = st.columns(3)
+
+with col_opt1:
+    resume_template = st.selectbox("Select Resume Template", [
+                                   "Classic", "Modern", "Creative"], key="resume_template")
+with col_opt2:
+    tone = st.radio("Preferred Tone", [
+                    "Professional", "Creative", "Enthusiastic"], key="tone")
+with col_opt3:
+    max_tokens = st.number_input(
+        "Max tokens", min_value=50, max_value=2000, value=1000, step=50, help="Controls the length of AI output.", key="max_tokens")
+    per_document_max_tokens = st.checkbox(
+        "Size output per document", value=True, key="per_document_max_tokens",
+        help="Uses a smaller limit for short documents (e.g. the portfolio summary), never above Max tokens.")
+
+# Workaround controls when OpenAI quota is exhausted
+use_mock = st.checkbox(
+    "Use mock responses (no OpenAI calls)", value=False, key="use_mock")
+if use_mock:
+    st.warning("Mock mode is ON. Content will be placeholder text.")
+
+bypass_cache = st.checkbox(
+    "Always generate a fresh sample (skip cache)", value=False, key="bypass_cache",
+    help="Identical requests are normally answered from the shared completion cache.")
+
+pdf_on_demand = st.checkbox(
+    "Build the PDF in the background only when requested", value=True, key="pdf_on_demand",
+    help="Keeps the page responsive while the PDF renders in a separate worker process.")
+
+pdf_backend = st.selectbox(
+    "PDF renderer", PDF_BACKENDS, index=PDF_BACKENDS.index(DEFAULT_PDF_BACKEND), key="pdf_backend",
+    help="xhtml2pdf converts styled HTML; reportlab draws the same sections directly, skipping the HTML/CSS step.")
+
+stream_output = st.checkbox(
+    "Stream output as it is generated", value=True, key="stream_output",
+    help="Shows each document token by token instead of waiting for the full response.")
+
+incremental_generation = st.checkbox(
+    "Only regenerate documents whose inputs changed", value=True, key="incremental_generation",
+    help="Documents whose skills, projects, experience, template, tone and length are unchanged keep their "
+    "current text. Turn this off to regenerate everything (e.g. for a fresh sample).")
+
+background_generation = st.checkbox(
+    "Run generation in the background", value=True, key="background_generation",
+    help="Queues the requests on the server and shows progress here. The work continues if the page "
+    "reruns or the connection drops, and the results are picked up when you come back.")
+
+single_call = st.checkbox(
+    "Generate all three documents in a single request", value=False, key="single_call",
+    help="Sends your skills, projects and experience once and asks for a structured (JSON) response. "
+    "Falls back to three separate requests if the response cannot be parsed. Output is not streamed.")
+
+# API Key Validation Button (outside the main flow)
+col_validate, col_recheck = st.columns([1, 1])
+with col_validate:
+    validate_clicked = st.button("Validate OpenAI API Key 🔑")
+with col_recheck:
+    recheck_clicked = st.button("Re-check now", help="Skip the shared validation result and call the API again.")
+if validate_clicked or recheck_clicked:
+    with st.spinner("Validating API key..."):
+        ok, message = validate_api_key(force=recheck_clicked)
+        if ok:
+            st.success(message)
+        else:
+            st.error(message)
+render_provider_status()
+
+st.divider()
+
+# --- Portfolio Projects Tab (for structured data) ---
+
+# Use tabs to separate complex input from output
+tabs = st.tabs(["**Portfolio Project Details** 🖼️", "**Generated Content** ✨"])
+
+# Initialize session state for project data
+if 'project_data' not in st.session_state:
+    st.session_state.project_data = []
+
+with tabs[0]:
+    st.subheader("Detailed Portfolio Projects (Optional)")
+    st.info("Use this section to add structured details (links) for a comprehensive PDF portfolio.")
+
+    num_projects = st.number_input("Number of Detailed Projects", min_value=0, value=len(
+        st.session_state.project_data), step=1, key="num_projects")
+
+    # Dynamic list management
+    if num_projects > len(st.session_state.project_data):
+        for _ in range(num_projects - len(st.session_state.project_data)):
+            st.session_state.project_data.append(
+                {"title": "", "description": "", "link": "", "image": None, "image_upload_id": None,
+                 "image_digest": None})
+    elif num_projects < len(st.session_state.project_data):
+        for i in range(num_projects, len(st.session_state.project_data)):
+            get_session_blobs().delete(f"project_{i}_image")
+        st.session_state.project_data = st.session_state.project_data[:num_projects]
+
+    for i in range(num_projects):
+        # Use a unique key for each file uploader based on its index
+        image_key = f"project_image_{i}_uploader"
+
+        with st.container(border=True):  # Use a container for visual grouping
+            st.markdown(f"#### Project {i+1}")
+            st.session_state.project_data[i]["title"] = st.text_input(
+                f"Project {i+1} Title", value=st.session_state.project_data[i]["title"], key=f"project_title_{i}")
+            st.session_state.project_data[i]["description"] = st.text_area(
+                f"Project {i+1} Description", value=st.session_state.project_data[i]["description"], key=f"project_description_{i}")
+            st.session_state.project_data[i]["link"] = st.text_input(
+                f"Project {i+1} Link (URL)", value=st.session_state.project_data[i]["link"], key=f"project_link_{i}")
+
+            # File Uploader
+            uploaded_file = st.file_uploader(
+                f"Upload Image for Project {i+1}", type=["png", "jpg", "jpeg"], key=image_key)
+
+            # Spool a downscaled thumbnail; session state only keeps its blob name
+            project = st.session_state.project_data[i]
+            image_name = f"project_{i}_image"
+            thumbnail = None
+            image_digest = project.get("image_digest")
+            if uploaded_file is not None:
+                upload_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+                if project.get("image_upload_id") == upload_id and project.get("image"):
+                    thumbnail = get_session_blobs().get(image_name)
+                if thumbnail is None:
+                    # New upload, or the blob was evicted (the thumbnail cache makes this cheap)
+                    try:
+                        thumbnail, image_digest = get_thumbnail(uploaded_file.getvalue())
+                    except ImageProcessingError as e:
+                        st.warning(str(e))
+                    if thumbnail is not None and not get_session_blobs().put(image_name, thumbnail):
+                        thumbnail = None
+                project["image"] = image_name if thumbnail is not None else None
+                project["image_upload_id"] = upload_id
+                project["image_digest"] = image_digest if thumbnail is not None else None
+            else:
+                # The user removed the image (or never set one)
+                if project.get("image"):
+                    get_session_blobs().delete(image_name)
+                project["image"] = None
+                project["image_upload_id"] = None
+                project["image_digest"] = None
+
+            # Preview uploaded image
+            if thumbnail is not None:
+                st.image(thumbnail,
+                         caption=f"Image preview for {project['title'] or f'Project {i+1}'}", width=250)
+                st.caption(
+                    "The image is downscaled and included in the PDF download.")
+
+# --- State Management for Generated Content ---
+if 'generated_resume' not in st.session_state:
+    st.session_state.generated_resume = None
+if 'generated_cover_letter' not in st.session_state:
+    st.session_state.generated_cover_letter = None
+if 'generated_portfolio' not in st.session_state:
+    st.session_state.generated_portfolio = None
+# Input fingerprint of each document's current text, and whether the last run regenerated it
+if 'doc_fingerprints' not in st.session_state:
+    st.session_state.doc_fingerprints = {}
+if 'doc_status' not in st.session_state:
+    st.session_state.doc_status = {}
+# Background generation job of this session (reattached from the URL after a reconnect)
+if 'generation_job' not in st.session_state:
+    st.session_state.generation_job = st.query_params.get("job")
+
+# --- Generate Button and Output Tab ---
+with tabs[1]:
+    generate_button = st.button("Generate Content 🚀", type="primary")
+
+    # Containers for generated output (will be filled after generation)
+    resume_output_container = st.empty()
+    cover_letter_output_container = st.empty()
+    portfolio_output_container = st.empty()
+
+    # Display settings shared by streaming updates and the final render
+    output_sections = {
+        'resume': (resume_output_container, "Generated Resume", "resume-section"),
+        'cover_letter': (cover_letter_output_container, "Generated Cover Letter", "cover-letter-section"),
+        'portfolio': (portfolio_output_container, "Generated Portfolio Summary", "portfolio-section"),
+    }
+
+    def render_output(doc_name, text):
+        """Renders (partial or final) markdown for a document into its placeholder."""
+        container, heading, css_class = output_sections[doc_name]
+        container.markdown(
+            f'<div class="generated-content {css_class}"><h3>{heading}</h3>{text}</div>', unsafe_allow_html=True)
+
+    if generate_button:
+        # 1. Process Input Data (parsed once per input change)
+        profile = current_profile()
+
+        if profile.is_empty():
+            st.warning(
+                "Please enter some skills, experience, or projects before generating content.")
+        else:
+            # 2. Define Prompts (project details are trimmed to the prompt budget)
+            doc_prompts = profile.prompts()
+            combined_prompt = profile.combined_prompt()
+            doc_max_tokens = document_max_tokens(
+                st.session_state.max_tokens, st.session_state.per_document_max_tokens)
+
+            # Only documents whose inputs changed since they were generated need a new request
+            fingerprints = document_fingerprints(
+                profile.input_fingerprints, doc_max_tokens, [generation.get_model_router().config(), st.session_state.use_mock])
+            stale_docs = [
+                name for name in DOCUMENT_NAMES
+                if not st.session_state.incremental_generation
+                or not st.session_state[f"generated_{name}"]
+                or st.session_state.doc_fingerprints.get(name) != fingerprints[name]
+            ]
+            stale_prompts = {name: doc_prompts[name] for name in stale_docs}
+            # The single request always returns all three documents
+            use_single_call = st.session_state.single_call and len(
+                stale_docs) == len(DOCUMENT_NAMES)
+
+            # Report the estimated token usage before anything is sent
+            if profile.projects_trimmed:
+                st.caption(
+                    f"Project details were shortened to fit the {PROMPT_PROJECT_TOKEN_BUDGET}-token prompt budget.")
+            if use_single_call:
+                st.caption(
+                    f"Estimated tokens: {count_tokens(combined_prompt)} prompt + up to "
+                    f"{sum(doc_max_tokens.values())} completion (single request).")
+            elif stale_docs:
+                usage = estimate_usage(stale_prompts, doc_max_tokens)
+                st.caption("Estimated tokens: " + " | ".join(
+                    f"{name.replace('_', ' ').title()}: {prompt_tokens} prompt + up to {completion_tokens} completion"
+                    for name, (prompt_tokens, completion_tokens) in usage.items()))
+
+            # 3. Generate Content (the stale documents are requested concurrently)
+            results = {}
+            # A newer generation supersedes (and aborts) the session's pending background job
+            if stale_docs and st.session_state.generation_job:
+                cancel_generation_job()
+            queued = stale_docs and st.session_state.background_generation
+            if queued:
+                # Queue the work and return at once; generation_job_status() polls it
+                payload = {
+                    "prompts": doc_prompts if use_single_call else stale_prompts,
+                    "combined_prompt": combined_prompt,
+                    "single_call": use_single_call,
+                    "max_tokens": doc_max_tokens,
+                    "mock": st.session_state.use_mock,
+                    "use_cache": not st.session_state.bypass_cache,
+                    "fingerprints": fingerprints,
+                }
+                st.session_state.generation_job = get_job_queue().enqueue(
+                    job_owner(), payload)
+                st.query_params["job"] = st.session_state.generation_job
+            elif stale_docs:
+                with st.spinner("Generating content..."):
+                    if use_single_call:
+                        results = generate_texts_single_call(
+                            combined_prompt,
+                            doc_prompts,
+                            max_tokens_override=doc_max_tokens,
+                            mock=st.session_state.use_mock,
+                            use_cache=not st.session_state.bypass_cache)
+                    elif st.session_state.stream_output:
+                        results = stream_texts_concurrently(
+                            stale_prompts,
+                            on_update=render_output,
+                            max_tokens_override=doc_max_tokens,
+                            mock=st.session_state.use_mock,
+                            use_cache=not st.session_state.bypass_cache)
+                    else:
+                        results = generate_texts_concurrently(
+                            stale_prompts,
+                            max_tokens_override=doc_max_tokens,
+                            mock=st.session_state.use_mock,
+                            use_cache=not st.session_state.bypass_cache)
+            else:
+                st.info("All documents are up to date with your inputs; nothing was regenerated.")
+
+            if not queued:
+                for error in apply_generation_results(results, fingerprints):
+                    st.error(error)
+
+            # 4. Display Feedback
+            if results and st.session_state.generated_resume and st.session_state.generated_cover_letter and st.session_state.generated_portfolio:
+                st.balloons()
+                st.toast('Content Generated Successfully!', icon='🎉')
+
+    # Progress (or completion) of this session's background generation job
+    generation_job_status()
+    for error in st.session_state.pop("generation_job_errors", []):
+        st.error(error)
+
+    # --- Display Content and Download Buttons (Executed on every run) ---
+    st.subheader("Generated Content")
+
+    # Which documents the last generation refreshed and which it kept
+    if st.session_state.doc_status:
+        st.caption(" | ".join(
+            f"{name.replace('_', ' ').title()}: "
+            f"{'🆕 regenerated' if status == 'fresh' else '♻️ reused (inputs unchanged)'}"
+            for name, status in st.session_state.doc_status.items()))
+
+    # Check if content exists (either generated or from session state after refresh)
+    if st.session_state.generated_resume:
+        render_output('resume', st.session_state.generated_resume)
+        st.download_button(
+            label="Download Resume (Text)",
+            data=st.session_state.generated_resume,
+            file_name="resume.txt",
+            mime="text/plain",
+            key="download_resume"
+        )
+
+    if st.session_state.generated_cover_letter:
+        render_output('cover_letter', st.session_state.generated_cover_letter)
+        st.download_button(
+            label="Download Cover Letter (Text)",
+            data=st.session_state.generated_cover_letter,
+            file_name="cover_letter.txt",
+            mime="text/plain",
+            key="download_cover_letter"
+        )
+
+    if st.session_state.generated_portfolio:
+        render_output('portfolio', st.session_state.generated_portfolio)
+
+        # --- FULL PDF DOWNLOAD OPTION ---
+
+        # 1. Prepare Data for PDF Function (images are only loaded if a render is needed)
+        profile = current_profile()
+        pdf_generated_content = {
+            'portfolio': st.session_state.generated_portfolio,
+            'resume': st.session_state.generated_resume
+        }
+
+        pdf_file_name = f"{st.session_state.user_name.replace(' ', '_')}_Full_Portfolio.pdf"
+        pdf_key = pdf_content_key(
+            profile.pdf_fingerprint, pdf_generated_content, st.session_state.pdf_backend)
+        # 2. Reuse this session's spooled PDF while its inputs are unchanged
+        pdf_data = session_pdf(pdf_key)
+        pdf_spooled = pdf_data is not None
+
+        if not pdf_spooled and st.session_state.pdf_on_demand:
+            # 3. Build the PDF in a worker process only when the user asks for it
+            pdf_data = get_pdf_render_cache().get(pdf_key)
+
+            # Drop a pending job whose inputs no longer match the page
+            pdf_job = st.session_state.get("pdf_job")
+            if pdf_job is not None and pdf_job["key"] != pdf_key:
+                st.session_state.pdf_job = None
+                pdf_job = None
+
+            pdf_job_error = st.session_state.pop("pdf_job_error", None)
+            if pdf_job_error:
+                st.error(pdf_job_error)
+
+            if pdf_data is None and pdf_job is None:
+                if st.button("Build COMPLETE Portfolio (PDF) 📄", key="build_full_portfolio_pdf"):
+                    st.session_state.pdf_job = submit_pdf_render(
+                        pdf_key, profile, pdf_generated_content, st.session_state.pdf_backend)
+
+            if pdf_data is None:
+                pdf_job_status()
+        elif not pdf_spooled:
+            # 3. Generate the PDF (served from the render cache when nothing changed)
+            pdf_data = create_full_pdf_cached(
+                pdf_key, profile, pdf_generated_content, st.session_state.pdf_backend)
+
+        if pdf_data and not pdf_spooled:
+            spool_session_pdf(pdf_key, pdf_data)
+
+        # 4. Create the Download Button
+        if pdf_data:
+            st.download_button(
+                label="Download COMPLETE Portfolio (PDF) 📥",
+                data=pdf_data,
+                file_name=pdf_file_name,
+                mime="application/pdf",
+                key="download_full_portfolio_pdf"
+            )
+
+        st.info("The generated PDF is styled professionally and includes your core data, detailed projects, and all AI-generated text.")
+
+# --- Admin Metrics Panel (enable with APP_ADMIN_PANEL=1, or ?admin=<APP_ADMIN_TOKEN>) ---
+if ADMIN_PANEL_ENABLED or admin_token_given():
+    render_admin_panel()
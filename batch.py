@@ -0,0 +1,296 @@
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+import generation
+from candidate_profile import Project, build_profile
+from metrics import METRICS, record_pdf_render
+from pdf_export import PDF_BACKENDS, render_full_pdf_with_timings
+from prompts import DOCUMENT_NAMES, split_lines, split_skills
+from token_budget import document_max_tokens
+
+STATUS_FILE = "status.json"
+
+
+def read_profiles(path):
+    """Yields candidate profile dicts from a .csv or .jsonl file.
+
+    Every profile gets an `id`; when the input has none, its 1-based row
+    number is used so reruns map rows to the same output directory. A row
+    that cannot be parsed is yielded as `{"id": ..., "parse_error": ...}`
+    so one bad line does not stop the run.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                row.setdefault("id", "")
+                row["id"] = row["id"] or str(row_number)
+                if row.get("detailed_projects"):
+                    try:
+                        row["detailed_projects"] = json.loads(
+                            row["detailed_projects"])
+                    except ValueError as e:
+                        yield {"id": row["id"], "parse_error": f"Invalid detailed_projects JSON: {e}"}
+                        continue
+                yield row
+    else:
+        with open(path, encoding="utf-8") as f:
+            row_number = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield {"id": str(row_number), "parse_error": f"Invalid JSON on row {row_number}: {e}"}
+                    continue
+                if not isinstance(row, dict):
+                    yield {"id": str(row_number),
+                           "parse_error": f"Row {row_number} is not a JSON object."}
+                    continue
+                row["id"] = str(row.get("id") or row_number)
+                yield row
+
+
+def _as_list(value, splitter):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return splitter(value)
+
+
+def _safe_dirname(profile_id):
+    """Returns the output directory name for a profile id.
+
+    Ids that are not already safe names get a short hash of the raw id
+    appended, so ids that sanitise alike (e.g. "a/b" and "a_b") never
+    share a directory.
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", profile_id).strip("._") or "profile"
+    if name != profile_id:
+        name += "-" + hashlib.sha256(profile_id.encode("utf-8")).hexdigest()[:8]
+    return name
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(tmp_path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_status(profile_dir):
+    try:
+        with open(os.path.join(profile_dir, STATUS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def process_profile(profile, out_dir, openai_api_key, pdf_executor, max_tokens, mock, use_cache, single_call=False,
+                    pdf_backend=None):
+    """Generates all documents (and the PDF) for one profile.
+
+    Outputs are written atomically and `status.json` is written last, so a
+    profile only counts as done once everything it produced is on disk.
+    Returns the status dict.
+    """
+    profile_dir = os.path.join(out_dir, _safe_dirname(profile["id"]))
+    os.makedirs(profile_dir, exist_ok=True)
+    started = time.time()
+
+    candidate = build_profile(
+        profile.get("name", ""), profile.get("contact", ""),
+        _as_list(profile.get("skills"), split_skills),
+        _as_list(profile.get("projects"), split_lines),
+        _as_list(profile.get("experience"), split_lines),
+        [Project(p.get('title', ''), p.get('description', ''), p.get('link', ''))
+         for p in profile.get("detailed_projects") or []],
+        profile.get("resume_template") or "Classic", profile.get("tone") or "Professional")
+    max_tokens = document_max_tokens(
+        max_tokens or generation.DEFAULT_MAX_TOKENS)
+
+    prompts = candidate.prompts()
+    if single_call:
+        results = generation.generate_documents_single_call(
+            candidate.combined_prompt(),
+            prompts, openai_api_key, max_tokens=max_tokens, mock=mock, use_cache=use_cache)
+    else:
+        results = generation.generate_documents(
+            prompts, openai_api_key, max_tokens=max_tokens, mock=mock, use_cache=use_cache)
+
+    errors = {}
+    for name in DOCUMENT_NAMES:
+        text, error = results[name]
+        if error:
+            errors[name] = error
+        else:
+            _write_atomic(os.path.join(profile_dir, f"{name}.md"), text)
+
+    if pdf_executor is not None and not errors:
+        generated_content = {
+            'portfolio': results['portfolio'][0],
+            'resume': results['resume'][0],
+        }
+        try:
+            pdf_bytes, timings = pdf_executor.submit(
+                render_full_pdf_with_timings, candidate.pdf_user_info(), generated_content,
+                candidate.pdf_projects(), pdf_backend).result()
+            record_pdf_render(timings, len(pdf_bytes))
+            _write_atomic(os.path.join(
+                profile_dir, "portfolio.pdf"), pdf_bytes)
+        except Exception as e:
+            errors["pdf"] = f"An unexpected error occurred during PDF generation ({pdf_backend or 'default backend'}): {e}"
+
+    METRICS.observe("batch_profile_seconds", time.time() - started)
+    status = {
+        "id": profile["id"],
+        "status": "failed" if errors else "done",
+        "errors": errors,
+        "seconds": round(time.time() - started, 3),
+    }
+    _write_atomic(os.path.join(profile_dir, STATUS_FILE),
+                  json.dumps(status, indent=2))
+    return status
+
+
+def _fail_profile(profile_id, out_dir, error):
+    """Records a profile that could not be processed at all; returns its status."""
+    profile_dir = os.path.join(out_dir, _safe_dirname(profile_id))
+    os.makedirs(profile_dir, exist_ok=True)
+    status = {"id": profile_id, "status": "failed",
+              "errors": {"profile": error}, "seconds": 0.0}
+    _write_atomic(os.path.join(profile_dir, STATUS_FILE),
+                  json.dumps(status, indent=2))
+    return status
+
+
+def run_batch(input_path, out_dir, workers=4, pdf_workers=None, max_tokens=None,
+              mock=False, use_cache=True, make_pdf=True, retry_failed=True, single_call=False, pdf_backend=None):
+    """Processes every profile in `input_path` with a bounded worker pool.
+
+    Profiles whose `status.json` already says "done" are skipped, so an
+    interrupted run can simply be started again. Returns a summary dict.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    openai_api_key = None if mock else generation.get_openai_api_key()
+    if not mock and not openai_api_key:
+        raise SystemExit(generation.MISSING_KEY_MESSAGE)
+
+    summary = {"done": 0, "failed": 0, "skipped": 0}
+    pdf_executor = None
+    if make_pdf:
+        pdf_executor = ProcessPoolExecutor(
+            max_workers=pdf_workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"))
+
+    def report(status):
+        summary[status["status"]] += 1
+        line = f"[{status['status']}] {status['id']}"
+        if status["errors"]:
+            line += f": {status['errors']}"
+        print(line, flush=True)
+
+    def collect(done):
+        for future in done:
+            profile_id = futures.pop(future)
+            try:
+                status = future.result()
+            except Exception as e:
+                status = {"id": profile_id, "status": "failed",
+                          "errors": {"profile": str(e)}}
+            report(status)
+
+    # Output directory -> id of the profile written there in this run
+    seen_dirs = {}
+    futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for profile in read_profiles(input_path):
+                dirname = _safe_dirname(profile["id"])
+                if dirname in seen_dirs:
+                    # Never overwrite (or skip as done) the output of an earlier row
+                    report({"id": profile["id"], "status": "failed", "errors": {
+                        "profile": f"Duplicate id; output directory {dirname!r} is already used in this run."}})
+                    continue
+                seen_dirs[dirname] = profile["id"]
+                if "parse_error" in profile:
+                    report(_fail_profile(profile["id"], out_dir, profile["parse_error"]))
+                    continue
+                previous = _load_status(os.path.join(out_dir, dirname))
+                if previous and (previous.get("status") == "done" or not retry_failed):
+                    summary["skipped"] += 1
+                    continue
+                # Keep the input streaming: only a few profiles wait in the queue
+                if len(futures) >= workers * 2:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    collect(done)
+                future = executor.submit(
+                    process_profile, profile, out_dir, openai_api_key, pdf_executor,
+                    max_tokens, mock, use_cache, single_call, pdf_backend)
+                futures[future] = profile["id"]
+
+            collect(as_completed(list(futures)))
+    finally:
+        if pdf_executor is not None:
+            pdf_executor.shutdown()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate resumes, cover letters and portfolio PDFs for many candidate profiles.")
+    parser.add_argument(
+        "input", help="Candidate profiles as .csv or .jsonl (fields: id, name, contact, skills, "
+        "projects, experience, resume_template, tone, detailed_projects).")
+    parser.add_argument("-o", "--out", default="batch_output",
+                        help="Output directory (default: batch_output).")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Number of profiles processed at the same time (default: 4).")
+    parser.add_argument("--pdf-workers", type=int, default=None,
+                        help="Number of PDF worker processes (default: CPU count).")
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help=f"Upper limit on tokens per document; each document type uses "
+                        f"a smaller size where it fits (default: {generation.DEFAULT_MAX_TOKENS}).")
+    parser.add_argument("--no-pdf", action="store_true",
+                        help="Skip PDF rendering.")
+    parser.add_argument("--pdf-backend", choices=PDF_BACKENDS, default=None,
+                        help="PDF renderer: xhtml2pdf (styled HTML) or reportlab (direct layout). "
+                        "Default: the PDF_BACKEND environment variable, else xhtml2pdf.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always request fresh completions.")
+    parser.add_argument("--skip-failed", action="store_true",
+                        help="Do not retry profiles that failed in a previous run.")
+    parser.add_argument("--single-call", action="store_true",
+                        help="Request all three documents in one structured (JSON) response.")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Write metrics to <prefix>.prom and <prefix>.json when the run ends.")
+    parser.add_argument("--mock", action="store_true",
+                        help="Use placeholder text instead of calling OpenAI.")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    summary = run_batch(
+        args.input, args.out, workers=args.workers, pdf_workers=args.pdf_workers,
+        max_tokens=args.max_tokens, mock=args.mock, use_cache=not args.no_cache,
+        make_pdf=not args.no_pdf, retry_failed=not args.skip_failed,
+        single_call=args.single_call, pdf_backend=args.pdf_backend)
+    if args.metrics_out:
+        METRICS.write_files(args.metrics_out)
+    print(f"Finished in {time.time() - started:.1f}s: {summary['done']} done, "
+          f"{summary['failed']} failed, {summary['skipped']} skipped.")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+import argparse
+import base64
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import zlib
+
+from pdf_export import PDF_BACKENDS, build_full_html, markdown_to_html, render_full_pdf
+
+# Synthetic profile sizes, from a tiny profile up to very heavy ones
+SIZES = {
+    "tiny": {"projects": 1, "ai_lines": 10, "skills": 5, "experience": 2},
+    "small": {"projects": 5, "ai_lines": 60, "skills": 15, "experience": 4},
+    "medium": {"projects": 25, "ai_lines": 300, "skills": 40, "experience": 10},
+    "large": {"projects": 100, "ai_lines": 1500, "skills": 100, "experience": 30},
+    "huge": {"projects": 400, "ai_lines": 5000, "skills": 300, "experience": 80},
+}
+
+WORDS = ("data pipeline model streamlit python analysis dashboard latency "
+         "customer growth revenue cloud deployment automation testing design").split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_markdown(rng, lines):
+    """Returns AI-style markdown: headings, bullet lists, paragraphs and blank lines."""
+    out = []
+    while len(out) < lines:
+        kind = rng.random()
+        if kind < 0.08:
+            out.append("## " + _sentence(rng, 4))
+        elif kind < 0.15:
+            out.append("### " + _sentence(rng, 3))
+        elif kind < 0.6:
+            out.append(rng.choice("*-") + " " + _sentence(rng))
+        elif kind < 0.9:
+            out.append(_sentence(rng, 30))
+        else:
+            out.append("")
+    return "\n".join(out)
+
+
+def synthetic_profile(size, seed=0):
+    """Returns `(user_info, generated_content, structured_projects)` for a size preset."""
+    spec = SIZES[size]
+    rng = random.Random(seed)
+    user_info = {
+        "name": "Jane Benchmark",
+        "contact": "jane@example.com | (555) 000-0000",
+        "skills": [f"{rng.choice(WORDS).title()} {i}" for i in range(spec["skills"])],
+        "experience": [f"{_sentence(rng, 6)} ({2000 + i}-{2001 + i})" for i in range(spec["experience"])],
+    }
+    generated_content = {
+        "portfolio": synthetic_markdown(rng, spec["ai_lines"]),
+        "resume": synthetic_markdown(rng, spec["ai_lines"]),
+    }
+    structured_projects = [
+        {"title": f"Project {i}: {_sentence(rng, 3)}",
+         "description": " ".join(_sentence(rng) for _ in range(4)),
+         "link": f"https://example.com/project/{i}"}
+        for i in range(spec["projects"])
+    ]
+    return user_info, generated_content, structured_projects
+
+
+def _pisa_convert(full_html):
+    from io import BytesIO
+
+    from xhtml2pdf import pisa
+
+    buffer = BytesIO()
+    pisa.CreatePDF(full_html, dest=buffer)
+    return buffer.getvalue()
+
+
+# Stream objects (dictionary + data) and literal strings in PDF content streams
+_PDF_STREAM = re.compile(rb"<<((?:(?!<<).)*?)>>\s*stream\r?\n(.*?)\s*endstream", re.S)
+_PDF_STRING = re.compile(rb"\(((?:[^()\\]|\\.)*)\)", re.S)
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _unescape_pdf_string(raw):
+    def replace(match):
+        escaped = match.group(1)
+        if escaped[:1].isdigit():
+            return bytes([int(escaped, 8) & 0xFF])
+        return _PDF_ESCAPES.get(escaped, escaped)
+    return re.sub(rb"\\([0-7]{1,3}|.)", replace, raw, flags=re.S).decode("latin-1")
+
+
+def pdf_text_lines(pdf_bytes):
+    """Returns the text strings drawn in a PDF's content streams, in order.
+
+    ASCII85 and Flate (zlib) encoded streams are decoded; images and other
+    streams are skipped.
+    """
+    lines = []
+    for match in _PDF_STREAM.finditer(pdf_bytes):
+        info, data = match.groups()
+        if b"/Image" in info:
+            continue
+        try:
+            if b"ASCII85Decode" in info:
+                data = base64.a85decode(data.removesuffix(b"~>"), adobe=False,
+                                        ignorechars=b" \t\r\n")
+            if b"FlateDecode" in info:
+                data = zlib.decompress(data)
+        except (ValueError, zlib.error):
+            continue
+        lines += [_unescape_pdf_string(raw) for raw in _PDF_STRING.findall(data)]
+    return lines
+
+
+def pdf_page_count(pdf_bytes):
+    return len(re.findall(rb"/Type\s*/Page\b", pdf_bytes))
+
+
+def expected_pdf_text(user_info, generated_content, structured_projects):
+    """Returns the name and section titles every backend must draw, in order."""
+    expected = [user_info["name"], "AI-Generated Portfolio Summary",
+                "Core Skills & Experience Summary"]
+    if any(p["title"] for p in structured_projects):
+        expected.append("Detailed Projects")
+    if generated_content.get("resume"):
+        expected.append("AI-Generated Resume Highlights")
+    return expected
+
+
+def check_pdf(pdf_bytes, user_info, generated_content, structured_projects):
+    """Returns a list of problems with a rendered PDF (empty when it looks right).
+
+    Every backend is held to the same checks: a complete PDF file with at
+    least one page (and as many page objects as its page tree declares)
+    that draws the candidate name, the section titles in order and the
+    first project titles.
+    """
+    problems = []
+    if not pdf_bytes.startswith(b"%PDF-"):
+        problems.append("missing %PDF- header")
+    if b"%%EOF" not in pdf_bytes[-1024:]:
+        problems.append("missing %%EOF trailer")
+    pages = pdf_page_count(pdf_bytes)
+    if pages < 1:
+        problems.append("no pages")
+    declared = [int(count) for count in re.findall(rb"/Count\s+(\d+)", pdf_bytes)]
+    if pages not in declared:
+        problems.append(f"{pages} page objects, page tree declares {declared}")
+
+    lines = pdf_text_lines(pdf_bytes)
+    position = 0
+    for text in expected_pdf_text(user_info, generated_content, structured_projects):
+        try:
+            position = lines.index(text, position) + 1
+        except ValueError:
+            problems.append(f"text not found (in order): {text[:40]!r}")
+    drawn = "\n".join(lines)
+    for project in structured_projects[:3]:
+        if project["title"] and project["title"][:20] not in drawn:
+            problems.append(f"project title not found: {project['title'][:40]!r}")
+    return problems
+
+
+def measure(func, repeat):
+    """Returns `(result, timing stats, peak traced memory)` for `func()`.
+
+    Timing runs and the memory run are separate so tracemalloc overhead does
+    not distort the times.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "min_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "max_seconds": max(times),
+    }, peak
+
+
+def run_benchmarks(sizes, repeat, include_pisa, backends=PDF_BACKENDS):
+    results = []
+    for size in sizes:
+        user_info, generated_content, structured_projects = synthetic_profile(
+            size)
+        stages = [
+            ("markdown_to_html", lambda: [markdown_to_html(text)
+                                          for text in generated_content.values()]),
+            ("html_build", lambda: build_full_html(
+                user_info, generated_content, structured_projects)),
+        ]
+        if include_pisa:
+            full_html = build_full_html(
+                user_info, generated_content, structured_projects)
+            stages.append(("pisa", lambda: _pisa_convert(full_html)))
+        # End-to-end render with each backend, checked with the same rules
+        for backend in backends:
+            stages.append((f"pdf_{backend}", lambda backend=backend: render_full_pdf(
+                user_info, generated_content, structured_projects, backend=backend)))
+
+        for stage, func in stages:
+            output, timing, peak = measure(func, repeat)
+            problems = []
+            if stage.startswith("pdf_"):
+                problems = check_pdf(
+                    output, user_info, generated_content, structured_projects)
+                for problem in problems:
+                    print(f"{size:>7} {stage:<17} CHECK FAILED: {problem}", flush=True)
+            output_bytes = sum(len(o) for o in output) if isinstance(
+                output, list) else len(output)
+            entry = {"size": size, "stage": stage, **timing,
+                     "peak_memory_bytes": peak, "output_bytes": output_bytes,
+                     "input": SIZES[size], "problems": problems}
+            results.append(entry)
+            print(f"{size:>7} {stage:<17} median {timing['median_seconds'] * 1000:10.2f} ms"
+                  f"  peak {peak / 1024:10.1f} KiB  output {output_bytes / 1024:10.1f} KiB", flush=True)
+    return results
+
+
+def compare(results, baseline_path):
+    """Prints the median-time and peak-memory ratio of each result against a saved run."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (new / old):")
+    for r in results:
+        old = baseline.get((r["size"], r["stage"]))
+        if not old:
+            continue
+        time_ratio = r["median_seconds"] / \
+            old["median_seconds"] if old["median_seconds"] else float("inf")
+        memory_ratio = r["peak_memory_bytes"] / \
+            old["peak_memory_bytes"] if old["peak_memory_bytes"] else float("inf")
+        print(f"{r['size']:>7} {r['stage']:<17} time x{time_ratio:6.2f}  memory x{memory_ratio:6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark markdown_to_html, HTML assembly and each PDF backend on synthetic profiles.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES),
+                        help="Profile sizes to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per stage (default: 3).")
+    parser.add_argument("--skip-pisa", action="store_true",
+                        help="Skip the standalone pisa conversion stage.")
+    parser.add_argument("--backends", nargs="*", choices=PDF_BACKENDS, default=list(PDF_BACKENDS),
+                        help="PDF backends to render end to end (default: all; pass none to skip).")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="Where to save the results as JSON (default: bench_results.json).")
+    parser.add_argument("--compare", metavar="BASELINE_JSON",
+                        help="Print ratios against a previously saved run.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat,
+                             not args.skip_pisa, args.backends)
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    failed = [r for r in results if r["problems"]]
+    if failed:
+        print(f"\n{len(failed)} rendered PDFs failed their checks")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
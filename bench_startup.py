@@ -0,0 +1,129 @@
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "app.py")
+
+
+def app_modules(path=APP_PATH):
+    """Returns the local modules app.py imports at module level, in import order.
+
+    Read from app.py itself so the benchmark cannot drift from the app;
+    streamlit and the standard library are left out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            top = name.split(".")[0]
+            if os.path.exists(os.path.join(HERE, f"{top}.py")) and top not in modules:
+                modules.append(top)
+    return modules
+
+
+# What app.py imports at startup (besides streamlit itself)
+APP_MODULES = app_modules()
+
+# Heavy stacks that are only imported on first use
+DEFERRED_MODULES = ["openai", "httpx", "tiktoken", "xhtml2pdf.pisa", "pdf_direct"]
+
+SCENARIOS = {
+    # Cold start of the app's own modules (what a new pod pays before first paint)
+    "app_startup": APP_MODULES,
+    # The same modules plus the stacks that used to be imported at module top
+    "eager_imports": APP_MODULES + ["openai", "tiktoken", "xhtml2pdf.pisa"],
+    "streamlit": ["streamlit"],
+    **{module: [module] for module in DEFERRED_MODULES},
+}
+
+
+def measure_import(modules, cwd):
+    """Imports `modules` in a fresh interpreter and returns `(seconds, error)`.
+
+    Uses `-X importtime`, so the time covers only the imports themselves and
+    not interpreter start-up.
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1]
+
+    # Top-level entries (no leading spaces before the name) add up to the total
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith(" ") or name.startswith("  "):
+            continue
+        total_us += int(cumulative)
+    return total_us / 1e6, None
+
+
+def run_benchmarks(scenarios, repeat, cwd):
+    results = []
+    for scenario in scenarios:
+        times = []
+        error = None
+        for _ in range(repeat):
+            seconds, error = measure_import(SCENARIOS[scenario], cwd)
+            if error:
+                break
+            times.append(seconds)
+        if error:
+            print(f"{scenario:>15}  skipped ({error})", flush=True)
+            results.append({"scenario": scenario, "error": error})
+            continue
+        entry = {"scenario": scenario, "modules": SCENARIOS[scenario],
+                 "min_seconds": min(times), "median_seconds": statistics.median(times),
+                 "max_seconds": max(times)}
+        results.append(entry)
+        print(f"{scenario:>15}  median {entry['median_seconds'] * 1000:9.1f} ms"
+              f"  min {entry['min_seconds'] * 1000:9.1f} ms", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure cold import times of the app's modules and of the lazily imported stacks.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="Scenarios to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Fresh interpreters per scenario (default: 5).")
+    parser.add_argument("--output", default="bench_startup.json",
+                        help="Where to save the results as JSON (default: bench_startup.json).")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenarios, args.repeat, HERE)
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import atexit
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from metrics import METRICS
+
+# Byte caps for spooled session data (uploads, rendered PDFs)
+SESSION_BLOB_MAX_BYTES = int(
+    os.getenv("SESSION_BLOB_MAX_BYTES", str(16 * 1024 * 1024)))
+BLOB_STORE_MAX_BYTES = int(
+    os.getenv("BLOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Blobs smaller than this stay in memory; larger ones are written to disk
+BLOB_SPOOL_THRESHOLD_BYTES = int(
+    os.getenv("BLOB_SPOOL_THRESHOLD_BYTES", str(64 * 1024)))
+# Sessions not seen for this long are dropped (backstop for missed cleanups)
+BLOB_SESSION_IDLE_SECONDS = float(
+    os.getenv("BLOB_SESSION_IDLE_SECONDS", "3600"))
+# Parent directory for the spool files (default: the system temp directory)
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR")
+
+_SWEEP_INTERVAL_SECONDS = 60.0
+
+
+class _Blob:
+    __slots__ = ("size", "data", "path")
+
+    def __init__(self, size, data=None, path=None):
+        self.size = size
+        self.data = data
+        self.path = path
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name) or "blob"
+
+
+class BlobStore:
+    """Process-wide store for large per-session blobs with byte caps and LRU eviction.
+
+    Small blobs are kept in memory; anything at or above `spool_threshold`
+    is written to a file under `root` and read back on demand, so sessions
+    only hold names in `st.session_state`. When a session exceeds
+    `max_session_bytes`, its least recently used blobs are evicted; when the
+    whole store exceeds `max_total_bytes`, the least recently used blobs of
+    any session are. Callers must treat a missing blob as a cache miss.
+    """
+
+    def __init__(self, root, max_session_bytes, max_total_bytes, spool_threshold,
+                 idle_seconds=BLOB_SESSION_IDLE_SECONDS):
+        self.root = root
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.spool_threshold = spool_threshold
+        self.idle_seconds = idle_seconds
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._blobs = OrderedDict()  # (session_id, name) -> _Blob, oldest first
+        self._session_bytes = {}
+        self._last_seen = {}
+        self._total_bytes = 0
+        self._memory_bytes = 0
+        self._evictions = 0
+        self._last_sweep = time.monotonic()
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.root, _safe_name(session_id))
+
+    def _remove_locked(self, key):
+        blob = self._blobs.pop(key)
+        self._total_bytes -= blob.size
+        self._session_bytes[key[0]] -= blob.size
+        if blob.data is not None:
+            self._memory_bytes -= blob.size
+        return blob.path
+
+    def _evict_locked(self, session_id):
+        """Evicts LRU blobs until both caps hold; returns the files to delete."""
+        paths = []
+        if self._session_bytes.get(session_id, 0) > self.max_session_bytes:
+            for key in [k for k in self._blobs if k[0] == session_id]:
+                if self._session_bytes[session_id] <= self.max_session_bytes:
+                    break
+                paths.append(self._remove_locked(key))
+                self._evictions += 1
+        while self._total_bytes > self.max_total_bytes and self._blobs:
+            paths.append(self._remove_locked(next(iter(self._blobs))))
+            self._evictions += 1
+        return paths
+
+    @staticmethod
+    def _unlink(paths):
+        for path in paths:
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def put(self, session_id, name, data):
+        """Stores `data` under `(session_id, name)`, replacing any previous blob.
+
+        Returns False (and stores nothing) if the blob alone exceeds the
+        per-session cap.
+        """
+        size = len(data)
+        if size > self.max_session_bytes:
+            return False
+        self._maybe_sweep()
+
+        blob = _Blob(size)
+        if size < self.spool_threshold:
+            blob.data = bytes(data)
+        else:
+            directory = self._session_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            blob.path = os.path.join(
+                directory, f"{_safe_name(name)}-{uuid.uuid4().hex}.blob")
+            with open(blob.path, "wb") as f:
+                f.write(data)
+
+        key = (session_id, name)
+        with self._lock:
+            stale = [self._remove_locked(key)] if key in self._blobs else []
+            self._blobs[key] = blob
+            self._total_bytes += size
+            self._session_bytes[session_id] = self._session_bytes.get(
+                session_id, 0) + size
+            if blob.data is not None:
+                self._memory_bytes += size
+            self._last_seen[session_id] = time.monotonic()
+            stale += self._evict_locked(session_id)
+        self._unlink(stale)
+        METRICS.observe("blob_put_bytes", size,
+                        storage="memory" if blob.data is not None else "disk")
+        return True
+
+    def get(self, session_id, name):
+        """Returns the blob's bytes, or None if it was never stored or has been evicted."""
+        key = (session_id, name)
+        with self._lock:
+            blob = self._blobs.get(key)
+            self._last_seen[session_id] = time.monotonic()
+            if blob is None:
+                return None
+            self._blobs.move_to_end(key)
+            if blob.data is not None:
+                return blob.data
+            path = blob.path
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            # Evicted between the lookup and the read
+            return None
+
+    def delete(self, session_id, name):
+        with self._lock:
+            path = self._remove_locked(
+                (session_id, name)) if (session_id, name) in self._blobs else None
+        self._unlink([path])
+
+    def drop_session(self, session_id):
+        """Frees every blob of a session (called when the session ends)."""
+        with self._lock:
+            paths = [self._remove_locked(key)
+                     for key in [k for k in self._blobs if k[0] == session_id]]
+            self._session_bytes.pop(session_id, None)
+            self._last_seen.pop(session_id, None)
+        self._unlink(paths)
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < _SWEEP_INTERVAL_SECONDS:
+                return
+            self._last_sweep = now
+            idle = [session_id for session_id, seen in self._last_seen.items()
+                    if now - seen > self.idle_seconds]
+        for session_id in idle:
+            self.drop_session(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._blobs),
+                    "sessions": sum(1 for size in self._session_bytes.values() if size),
+                    "bytes": self._total_bytes,
+                    "memory_bytes": self._memory_bytes,
+                    "disk_bytes": self._total_bytes - self._memory_bytes,
+                    "evictions": self._evictions}
+
+    def close(self):
+        with self._lock:
+            self._blobs.clear()
+            self._session_bytes.clear()
+            self._last_seen.clear()
+            self._total_bytes = self._memory_bytes = 0
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class SessionBlobs:
+    """One session's view of a `BlobStore`.
+
+    Keep an instance in `st.session_state`: when Streamlit discards the
+    session, the instance is garbage collected and the session's blobs are
+    freed. Idle sessions are also swept by the store as a backstop.
+    """
+
+    def __init__(self, store, session_id=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self._store = store
+        self._finalizer = weakref.finalize(
+            self, store.drop_session, self.session_id)
+
+    def put(self, name, data):
+        return self._store.put(self.session_id, name, data)
+
+    def get(self, name):
+        return self._store.get(self.session_id, name)
+
+    def delete(self, name):
+        self._store.delete(self.session_id, name)
+
+    def close(self):
+        self._finalizer()
+
+
+_store_lock = threading.Lock()
+_blob_store = None
+
+
+def get_blob_store():
+    """Returns the process-wide blob store; its spool directory is removed at exit."""
+    global _blob_store
+    with _store_lock:
+        if _blob_store is None:
+            root = tempfile.mkdtemp(prefix="app-blobs-", dir=BLOB_STORE_DIR)
+            _blob_store = BlobStore(root, SESSION_BLOB_MAX_BYTES,
+                                    BLOB_STORE_MAX_BYTES, BLOB_SPOOL_THRESHOLD_BYTES)
+            atexit.register(_blob_store.close)
+        return _blob_store
@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from prompts import build_combined_prompt, build_prompts, content_fingerprint, projects_for_ai, split_lines, split_skills
+from token_budget import PROMPT_PROJECT_TOKEN_BUDGET, fit_entries
+
+# Profile inputs that affect the rendered PDF (the prompt inputs are in prompts.DOCUMENT_INPUTS)
+PDF_INPUTS = ('name', 'contact', 'skills', 'experience', 'detailed_projects')
+
+
+@dataclass(frozen=True, slots=True)
+class Project:
+    """One detailed project; `image` names the session blob with its thumbnail."""
+    title: str
+    description: str = ''
+    link: str = ''
+    image: str | None = None
+    # Content hash of the uploaded image (the thumbnail is derived from it), so
+    # fingerprints never need the image bytes
+    image_digest: str | None = None
+
+    def fingerprint_fields(self):
+        return [self.title, self.description, self.link, self.image_digest]
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class CandidateProfile:
+    """The candidate's inputs, parsed once and shared by prompts, caching and the PDF.
+
+    `projects` holds the project entries sent to the model (the brief
+    list plus the detailed projects, trimmed to the prompt budget).
+    `input_fingerprints` hashes each input separately, so a document's
+    fingerprint only covers the inputs its prompt uses; `fingerprint`
+    covers the whole profile and `pdf_fingerprint` what the PDF shows.
+    Profiles compare and hash by `fingerprint`.
+    """
+    name: str
+    contact: str
+    skills: tuple[str, ...]
+    experience: tuple[str, ...]
+    projects: tuple[str, ...]
+    projects_trimmed: bool
+    detailed_projects: tuple[Project, ...]
+    resume_template: str
+    tone: str
+    input_fingerprints: dict[str, str] = field(init=False, repr=False)
+    fingerprint: str = field(init=False, repr=False)
+    pdf_fingerprint: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        values = {
+            'name': self.name,
+            'contact': self.contact,
+            'skills': list(self.skills),
+            'experience': list(self.experience),
+            'projects': list(self.projects),
+            'detailed_projects': [p.fingerprint_fields() for p in self.detailed_projects],
+            'resume_template': self.resume_template,
+            'tone': self.tone,
+        }
+        hashes = {name: content_fingerprint(value) for name, value in values.items()}
+        object.__setattr__(self, 'input_fingerprints', hashes)
+        object.__setattr__(self, 'fingerprint', content_fingerprint(sorted(hashes.items())))
+        object.__setattr__(self, 'pdf_fingerprint', content_fingerprint(
+            [[name, hashes[name]] for name in PDF_INPUTS]))
+
+    def __eq__(self, other):
+        if not isinstance(other, CandidateProfile):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def is_empty(self):
+        """Returns True if there is nothing to generate documents from."""
+        return not self.skills and not self.projects and not self.experience
+
+    def prompts(self):
+        """Returns the per-document prompts (built once per profile)."""
+        return dict(_prompts(self))
+
+    def combined_prompt(self):
+        """Returns the single-request prompt for all three documents."""
+        return _combined_prompt(self)
+
+    def pdf_user_info(self):
+        return {'name': self.name, 'contact': self.contact,
+                'skills': list(self.skills), 'experience': list(self.experience)}
+
+    def pdf_projects(self, load_image=None):
+        """Returns the titled projects as PDF dicts; `load_image(blob_name)` supplies thumbnails."""
+        return [
+            {'title': p.title, 'description': p.description, 'link': p.link,
+             'image': load_image(p.image) if p.image and load_image else None}
+            for p in self.detailed_projects if p.title
+        ]
+
+
+@lru_cache(maxsize=64)
+def _prompts(profile):
+    return build_prompts(list(profile.skills), list(profile.projects), list(profile.experience),
+                         profile.resume_template, profile.tone)
+
+
+@lru_cache(maxsize=64)
+def _combined_prompt(profile):
+    return build_combined_prompt(list(profile.skills), list(profile.projects), list(profile.experience),
+                                 profile.resume_template, profile.tone)
+
+
+def build_profile(name, contact, skills, project_names, experience, detailed_projects,
+                  resume_template, tone):
+    """Builds a profile from already-split entries; `detailed_projects` are `Project`s."""
+    detailed_projects = tuple(detailed_projects)
+    projects, projects_trimmed = fit_entries(
+        projects_for_ai(list(project_names),
+                        [{'title': p.title, 'description': p.description} for p in detailed_projects]),
+        PROMPT_PROJECT_TOKEN_BUDGET)
+    return CandidateProfile(
+        name=name, contact=contact, skills=tuple(skills), experience=tuple(experience),
+        projects=tuple(projects), projects_trimmed=projects_trimmed,
+        detailed_projects=detailed_projects, resume_template=resume_template, tone=tone)
+
+
+@lru_cache(maxsize=256)
+def parse_profile(name, contact, skills_text, projects_text, experience_text, detailed_projects,
+                  resume_template, tone):
+    """Parses the raw form inputs into a profile.
+
+    Cached on the raw values (`detailed_projects` must be a tuple of
+    `Project`s), so reruns with unchanged inputs reuse the parsed profile
+    instead of re-splitting, re-counting tokens and re-hashing.
+    """
+    return build_profile(name, contact, split_skills(skills_text), split_lines(projects_text),
+                         split_lines(experience_text), detailed_projects, resume_template, tone)
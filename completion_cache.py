@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CompletionCache:
+    """Two-tier cache for LLM completions.
+
+    Entries are keyed on a content hash of the request (prompt, model,
+    max_tokens, temperature). Lookups go to an in-memory LRU first and then
+    to an SQLite file on disk, so cached completions are shared by every
+    session in the process and survive restarts. Both tiers expire entries
+    after `ttl_seconds` and are bounded by entry count.
+    """
+
+    def __init__(self, path, max_memory_entries=256, max_disk_entries=5000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt, model, max_tokens, temperature):
+        """Returns the content hash identifying a completion request."""
+        payload = json.dumps(
+            {"prompt": prompt, "model": model,
+                "max_tokens": max_tokens, "temperature": temperature},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _is_fresh(self, created_at, now):
+        return self.ttl_seconds is None or now - created_at < self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached completion for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if self._is_fresh(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._is_fresh(row[1], now):
+                self._conn.execute(
+                    "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self._remember(key, row[0], row[1])
+                self._counters["disk_hits"] += 1
+                return row[0]
+            if row is not None:
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        """Stores `value` in both tiers and evicts expired or excess entries."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict_disk(now)
+            self._conn.commit()
+
+    def _remember(self, key, value, created_at):
+        # Caller must hold self._lock
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        # Caller must hold self._lock
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM completions WHERE created_at <= ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM completions").fetchone()
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                """DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY accessed_at ASC LIMIT ?
+                )""",
+                (count - self.max_disk_entries,),
+            )
+
+    def clear(self):
+        """Removes every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and current tier sizes."""
+        with self._lock:
+            (disk_entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM completions").fetchone()
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = disk_entries
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups) if lookups else 0.0
+        return stats
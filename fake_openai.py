@@ -0,0 +1,269 @@
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words used to build fake completions (markdown-ish, like the real documents)
+WORDS = ("data pipeline model streamlit python analysis dashboard latency "
+         "customer growth revenue cloud deployment automation testing design").split()
+DOCUMENT_NAMES = ("resume", "cover_letter", "portfolio")
+
+
+class FakeOpenAIConfig:
+    """Latency and failure settings of the fake server.
+
+    Latencies follow a log-normal distribution with the given median and
+    `latency_sigma` (0 = constant). `first_token_median` is the delay before
+    a response (or the first streamed chunk) and `token_seconds` the delay
+    per streamed token. `rate_limit_rate` and `error_rate` are the shares of
+    requests answered with 429 (with Retry-After) and 500.
+    """
+
+    def __init__(self, first_token_median=0.5, latency_sigma=0.5, token_seconds=0.01,
+                 completion_tokens=200, rate_limit_rate=0.0, error_rate=0.0,
+                 retry_after_seconds=1.0, seed=None):
+        self.first_token_median = first_token_median
+        self.latency_sigma = latency_sigma
+        self.token_seconds = token_seconds
+        self.completion_tokens = completion_tokens
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after_seconds = retry_after_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_delay(self):
+        with self._lock:
+            if self.latency_sigma <= 0:
+                return self.first_token_median
+            return self.first_token_median * math.exp(self._rng.gauss(0, self.latency_sigma))
+
+    def roll(self):
+        """Returns "rate_limited", "error" or "ok" for the next request."""
+        with self._lock:
+            value = self._rng.random()
+        if value < self.rate_limit_rate:
+            return "rate_limited"
+        if value < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def fake_words(self, count):
+        with self._lock:
+            return [self._rng.choice(WORDS) for _ in range(count)]
+
+
+class FakeOpenAIStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, outcome):
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": dict(self.counts), "in_flight": self.in_flight,
+                    "max_in_flight": self.max_in_flight}
+
+
+def _completion_text(config, max_tokens, json_mode):
+    tokens = max(1, min(config.completion_tokens, max_tokens or config.completion_tokens))
+    if json_mode:
+        per_document = max(1, tokens // len(DOCUMENT_NAMES))
+        return json.dumps({name: "## " + " ".join(config.fake_words(per_document))
+                           for name in DOCUMENT_NAMES})
+    words = config.fake_words(tokens)
+    lines = ["## " + " ".join(words[:4])]
+    for i in range(4, len(words), 12):
+        lines.append("* " + " ".join(words[i:i + 12]))
+    return "\n".join(lines)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Serves the subset of the OpenAI API the app uses (chat completions and models)."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, error_type, headers=None):
+        self._send_json(status, {"error": {"message": message, "type": error_type,
+                                           "param": None, "code": None}}, headers)
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "fake"}
+                for model in ("gpt-3.5-turbo", "gpt-4o-mini", "gpt-4o")]})
+        elif self.path.startswith("/v1/models/"):
+            model = self.path[len("/v1/models/"):]
+            self._send_json(200, {"id": model, "object": "model",
+                                  "created": 0, "owned_by": "fake"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Invalid JSON body.", "invalid_request_error")
+            return
+        if self.path != "/v1/chat/completions":
+            self._send_error(404, f"Unknown path {self.path}", "invalid_request_error")
+            return
+
+        config = self.server.config
+        stats = self.server.stats
+        stats.start()
+        outcome = "ok"
+        try:
+            time.sleep(config.sample_delay())
+            outcome = config.roll()
+            if outcome == "rate_limited":
+                self._send_error(429, "Rate limit reached (fake).", "rate_limit_exceeded",
+                                 {"Retry-After": f"{config.retry_after_seconds:g}"})
+                return
+            if outcome == "error":
+                self._send_error(500, "Internal server error (fake).", "server_error")
+                return
+
+            json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+            text = _completion_text(config, request.get("max_tokens"), json_mode)
+            prompt_tokens = sum(len(str(m.get("content", "")).split())
+                                for m in request.get("messages", []))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text.split()),
+                     "total_tokens": prompt_tokens + len(text.split())}
+            if request.get("stream"):
+                outcome = self._stream(request, text, usage)
+            else:
+                time.sleep(config.token_seconds * len(text.split()))
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion",
+                    "created": int(time.time()), "model": request.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}],
+                    "usage": usage,
+                })
+        finally:
+            stats.finish(outcome)
+
+    def _stream(self, request, text, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model")}
+
+        def _event(choices, **extra):
+            payload = dict(base, choices=choices, **extra)
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            for i, word in enumerate(text.split(" ")):
+                _event([{"index": 0, "finish_reason": None,
+                         "delta": {"content": word if i == 0 else " " + word}}])
+                time.sleep(self.server.config.token_seconds)
+            _event([{"index": 0, "finish_reason": "stop", "delta": {}}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                _event([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream (e.g. a cancelled generation)
+            return "client_closed"
+        finally:
+            self.close_connection = True
+        return "ok"
+
+
+def start_fake_server(config=None, host="127.0.0.1", port=0):
+    """Starts the fake server on a daemon thread; returns `(server, base_url)`.
+
+    Point the app at it with OPENAI_BASE_URL=<base_url> and any API key.
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = config or FakeOpenAIConfig()
+    server.stats = FakeOpenAIStats()
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--first-token-median", type=float, default=0.5,
+                        help="Median seconds before the response / first token (default: 0.5).")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="Log-normal sigma of that delay; 0 makes it constant (default: 0.5).")
+    parser.add_argument("--token-seconds", type=float, default=0.01,
+                        help="Delay per generated token (default: 0.01).")
+    parser.add_argument("--completion-tokens", type=int, default=200,
+                        help="Tokens per completion, capped by max_tokens (default: 200).")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of requests answered with 429 (default: 0).")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with 500 (default: 0).")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for reproducible runs.")
+
+
+def config_from_args(args):
+    return FakeOpenAIConfig(
+        first_token_median=args.first_token_median, latency_sigma=args.latency_sigma,
+        token_seconds=args.token_seconds, completion_tokens=args.completion_tokens,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate, seed=args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a local OpenAI-compatible server with configurable latency and failures.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fake_server(config_from_args(args), args.host, args.port)
+    print(f"Fake OpenAI server listening on {base_url}")
+    print(f"Start the app with: OPENAI_BASE_URL={base_url} OPENAI_API_KEY=fake streamlit run app.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,755 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from completion_cache import CompletionCache
+from metrics import METRICS, record_cancellation, record_usage, timed_import
+from model_router import MODEL_ROUTES, MODEL_ROUTING_ENABLED, ModelRouter, is_provider_failure, should_fail_over
+from prompts import DOCUMENT_NAMES
+from rate_limit import RequestScheduler
+from single_flight import SingleFlight, StreamFlights
+from token_budget import count_tokens
+
+# OpenAI request settings (part of the completion cache key); documents are
+# routed to their own models (see model_router.py), everything else uses OPENAI_MODEL
+OPENAI_MODEL = "gpt-3.5-turbo"
+OPENAI_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 1000
+
+# OpenAI HTTP client settings (shared by every caller in this process)
+# API endpoint override, e.g. the local fake server used for load tests (fake_openai.py)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(
+    os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+# Completion cache settings (in-memory LRU backed by an SQLite file)
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "completions.sqlite3"))
+COMPLETION_CACHE_TTL_SECONDS = float(
+    os.getenv("COMPLETION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+COMPLETION_CACHE_MEMORY_ENTRIES = int(
+    os.getenv("COMPLETION_CACHE_MEMORY_ENTRIES", "256"))
+COMPLETION_CACHE_DISK_ENTRIES = int(
+    os.getenv("COMPLETION_CACHE_DISK_ENTRIES", "5000"))
+
+# Request scheduling: shared rate limits and retry policy for all completion calls
+OPENAI_REQUESTS_PER_MINUTE = int(
+    os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_RETRY_BASE_DELAY_SECONDS = float(
+    os.getenv("OPENAI_RETRY_BASE_DELAY_SECONDS", "1"))
+OPENAI_RETRY_MAX_DELAY_SECONDS = float(
+    os.getenv("OPENAI_RETRY_MAX_DELAY_SECONDS", "30"))
+# A Retry-After longer than this fails the request instead of waiting
+OPENAI_MAX_RETRY_AFTER_SECONDS = float(
+    os.getenv("OPENAI_MAX_RETRY_AFTER_SECONDS", "120"))
+
+# API key validation results are shared by all sessions for this long
+API_KEY_VALIDATION_TTL_SECONDS = float(
+    os.getenv("API_KEY_VALIDATION_TTL_SECONDS", "600"))
+
+MISSING_KEY_MESSAGE = "OpenAI API key not found. Please add your key as an environment variable or in Streamlit secrets."
+UNEXPECTED_FORMAT_MESSAGE = "OpenAI returned an unexpected response format."
+CANCELLED_MESSAGE = "Generation was cancelled."
+
+_singleton_lock = threading.Lock()
+_openai_clients = {}
+_completion_cache = None
+_request_scheduler = None
+_model_router = None
+_key_validations = {}  # sha256 of the key -> (ok, message, expires_at)
+# Identical concurrent completion requests (from any session) share one upstream call
+_completion_flights = SingleFlight("completion")
+_stream_flights = StreamFlights("completion")
+
+
+def get_openai_api_key():
+    """Returns the OpenAI API key from the environment."""
+    return os.getenv("OPENAI_API_KEY")
+
+
+def get_openai_client(api_key):
+    """Returns the process-wide OpenAI client for `api_key`.
+
+    Every caller in the process reuses the same keep-alive connection pool
+    instead of opening a new one (and a new TLS handshake) per request.
+    """
+    if not api_key:
+        return None
+    with _singleton_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            # The SDK (and httpx) are only loaded once a client is needed
+            httpx = timed_import("httpx")
+            timed_import("openai")
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS,
+                                      connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            )
+            # Retries are handled by the request scheduler, not the SDK
+            client = OpenAI(api_key=api_key, base_url=OPENAI_BASE_URL,
+                            http_client=http_client, max_retries=0)
+            _openai_clients[api_key] = client
+        return client
+
+
+def get_completion_cache():
+    """Returns the process-wide completion cache."""
+    global _completion_cache
+    with _singleton_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache(
+                COMPLETION_CACHE_PATH,
+                max_memory_entries=COMPLETION_CACHE_MEMORY_ENTRIES,
+                max_disk_entries=COMPLETION_CACHE_DISK_ENTRIES,
+                ttl_seconds=COMPLETION_CACHE_TTL_SECONDS,
+            )
+        return _completion_cache
+
+
+def get_request_scheduler():
+    """Returns the process-wide request scheduler (rate limits and retries)."""
+    global _request_scheduler
+    with _singleton_lock:
+        if _request_scheduler is None:
+            _request_scheduler = RequestScheduler(
+                OPENAI_REQUESTS_PER_MINUTE,
+                OPENAI_TOKENS_PER_MINUTE,
+                max_retries=OPENAI_MAX_RETRIES,
+                base_delay=OPENAI_RETRY_BASE_DELAY_SECONDS,
+                max_delay=OPENAI_RETRY_MAX_DELAY_SECONDS,
+                max_retry_after=OPENAI_MAX_RETRY_AFTER_SECONDS,
+            )
+        return _request_scheduler
+
+
+def get_model_router():
+    """Returns the process-wide model router (per-document models and model health)."""
+    global _model_router
+    with _singleton_lock:
+        if _model_router is None:
+            _model_router = ModelRouter(
+                MODEL_ROUTES, OPENAI_MODEL, enabled=MODEL_ROUTING_ENABLED)
+        return _model_router
+
+
+def _new_sdk_client(openai_api_key):
+    """Returns the shared client, or None when only the legacy SDK is installed."""
+    try:
+        return get_openai_client(openai_api_key)
+    except ImportError:
+        return None
+
+
+def check_api_key(openai_api_key):
+    """Checks the key with one cheap authenticated call (listing the models).
+
+    No particular model is asked for, so a key is not judged by access to
+    a model it may never be routed to. Returns `(ok, message, definitive)`;
+    only successes and 401 (authentication) errors say something definite
+    about the key, so permission errors, network errors and outages are not
+    `definitive`.
+    """
+    get_request_scheduler().requests.acquire(1)
+    client = _new_sdk_client(openai_api_key)
+    try:
+        if client is not None:
+            client.models.list()
+        else:
+            openai = timed_import("openai")
+            openai.api_key = openai_api_key
+            openai.Model.list()
+        return True, "OpenAI API key is valid.", True
+    except Exception as e:
+        status = getattr(e, "status_code", None) or getattr(
+            e, "http_status", None)
+        return False, f"Validation failed. Error: {e}", status == 401
+
+
+def _key_digest(openai_api_key):
+    return hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest()
+
+
+def remember_api_key_validation(openai_api_key, ok, message):
+    """Stores a definitive validation result for API_KEY_VALIDATION_TTL_SECONDS."""
+    with _singleton_lock:
+        _key_validations[_key_digest(openai_api_key)] = (
+            ok, message, time.monotonic() + API_KEY_VALIDATION_TTL_SECONDS)
+
+
+def validate_api_key(openai_api_key, use_cache=True):
+    """Validates an API key, sharing results across sessions.
+
+    Results are cached process-wide under a hash of the key (the key itself
+    is never stored). Returns `(ok, message, cached)`.
+    """
+    digest = _key_digest(openai_api_key)
+    if use_cache:
+        with _singleton_lock:
+            entry = _key_validations.get(digest)
+        if entry is not None and entry[2] > time.monotonic():
+            METRICS.increment("api_key_validation_cache_total", result="hit")
+            return entry[0], entry[1], True
+    METRICS.increment("api_key_validation_cache_total", result="miss")
+
+    ok, message, definitive = check_api_key(openai_api_key)
+    if definitive:
+        remember_api_key_validation(openai_api_key, ok, message)
+    return ok, message, False
+
+
+def _record_retry(route):
+    def _on_retry(attempt, exc, delay):
+        METRICS.increment("llm_retries_total", route=route,
+                          error=type(exc).__name__)
+    return _on_retry
+
+
+def mock_completion(prompt):
+    """Returns placeholder text used when OpenAI calls are disabled."""
+    return f"(MOCK) Generated content for prompt preview. Prompt starts: {prompt[:120]}..."
+
+
+def completion_cache_key(prompt, max_tokens, model=OPENAI_MODEL):
+    return CompletionCache.make_key(prompt, model, max_tokens, OPENAI_TEMPERATURE)
+
+
+def _cache_lookup(cache, keys):
+    """Returns the first cached completion among `keys` (one per candidate model) and counts the hit or miss."""
+    for key in keys:
+        cached = cache.get(key)
+        if cached is not None:
+            break
+    METRICS.increment("completion_cache_lookups_total",
+                      result="miss" if cached is None else "hit")
+    return cached
+
+
+class _StreamStarted(Exception):
+    """Wraps a stream error raised after text was delivered (no failover then)."""
+
+
+def _with_failover(document, models, call):
+    """Returns `call(model)` for the first of `models` that succeeds.
+
+    Errors another model cannot fix (see `model_router.should_fail_over`),
+    failures after a stream has delivered text, and cancellations are
+    raised at once, as is the last model's error.
+    """
+    for position, model in enumerate(models):
+        try:
+            return call(model)
+        except CancelledError:
+            raise
+        except Exception as e:
+            if position == len(models) - 1 or isinstance(e, _StreamStarted) or not should_fail_over(e):
+                raise
+            METRICS.increment("model_failovers_total", document=document,
+                              model=model, error=type(e).__name__)
+
+
+def request_completion(prompt, max_tokens, openai_api_key, response_format=None, model=OPENAI_MODEL,
+                       cancel_event=None):
+    """Sends a single chat completion request and returns the stripped text.
+
+    `response_format` (e.g. `{"type": "json_object"}`) is only sent with the
+    new SDK. Raises on any API or format error so callers can decide how to
+    report it. The latency and outcome are reported to the model router.
+    Setting `cancel_event` raises CancelledError instead of waiting for a
+    retry.
+    """
+    extra_params = {"response_format": response_format} if response_format else {}
+    messages = [{"role": "user", "content": prompt}]
+    estimated_tokens = count_tokens(prompt) + max_tokens
+    route = "structured" if response_format else "blocking"
+    client = _new_sdk_client(openai_api_key)
+    started = time.perf_counter()
+    # Handles both the new and the legacy SDK; API errors are not masked by a fallback
+    try:
+        if client is not None:
+            response = get_request_scheduler().run(
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=OPENAI_TEMPERATURE,
+                    **extra_params,
+                ),
+                estimated_tokens,
+                on_retry=_record_retry(route),
+                cancel_event=cancel_event,
+            )
+        else:
+            openai = timed_import("openai")
+            openai.api_key = openai_api_key
+            response = get_request_scheduler().run(
+                lambda: openai.ChatCompletion.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    n=1,
+                    stop=None,
+                    temperature=OPENAI_TEMPERATURE,
+                ),
+                estimated_tokens,
+                on_retry=_record_retry(route),
+                cancel_event=cancel_event,
+            )
+    except CancelledError:
+        record_cancellation(route, 0, estimated_tokens)
+        raise
+    except Exception as e:
+        METRICS.increment("llm_errors_total", route=route,
+                          error=type(e).__name__)
+        if is_provider_failure(e):
+            get_model_router().record(model, ok=False)
+        raise
+    finally:
+        METRICS.observe("llm_request_seconds",
+                        time.perf_counter() - started, route=route)
+    get_model_router().record(model, time.perf_counter() - started)
+    usage = response.get("usage") if isinstance(
+        response, dict) else getattr(response, "usage", None)
+    record_usage(usage, route)
+
+    if response and getattr(response, "choices", None):
+        choice = response.choices[0]
+        content = None
+        if isinstance(choice, dict):
+            content = choice.get("message", {}).get("content")
+        else:
+            content = getattr(
+                getattr(choice, "message", None), "content", None)
+
+        if content:
+            return content.strip()
+
+    raise ValueError(UNEXPECTED_FORMAT_MESSAGE)
+
+
+def cached_completion(prompt, max_tokens, openai_api_key, cache=None, use_cache=True, document=None,
+                      cancel_event=None):
+    """Returns a cached completion when available, otherwise requests one.
+
+    The request goes to the models routed for `document` (the default model
+    when None), failing over to the next one on error; a completion cached
+    for any of them is reused. Concurrent cache misses for the same request
+    are coalesced: one caller sends it and the others wait for (and share)
+    its result or error. With `use_cache=False` the cache is not consulted
+    and every caller gets its own fresh sample, but the result still
+    replaces the stored entry. `cancel_event` stops the caller's own request
+    while it waits to retry (waiting callers then send theirs), or stops
+    waiting for another caller's request.
+    """
+    cache = cache or get_completion_cache()
+    models = get_model_router().candidates(document, count_tokens(prompt))
+
+    def _request(model):
+        key = completion_cache_key(prompt, max_tokens, model)
+
+        def _fetch():
+            content = request_completion(
+                prompt, max_tokens, openai_api_key, model=model, cancel_event=cancel_event)
+            cache.set(key, content)
+            return content
+
+        if not use_cache:
+            return _fetch()
+        content, _ = _completion_flights.do(
+            (key, _key_digest(openai_api_key or "")), _fetch, cancel_event=cancel_event)
+        return content
+
+    if use_cache:
+        cached = _cache_lookup(
+            cache, [completion_cache_key(prompt, max_tokens, model) for model in models])
+        if cached is not None:
+            return cached
+    return _with_failover(document, models, _request)
+
+
+def stream_completion(prompt, max_tokens, openai_api_key, model=OPENAI_MODEL, cancel_event=None):
+    """Yields the text deltas of a streamed chat completion (`stream=True`).
+
+    Only the new SDK supports streaming; errors are raised to the caller.
+    Opening the stream goes through the request scheduler, so rate-limit
+    errors are retried before the first token arrives. Closing the generator
+    early closes the HTTP response, which aborts the completion upstream.
+    Setting `cancel_event` raises CancelledError instead of waiting for a
+    retry. Latency, time to first token and outcome are reported to the
+    model router.
+    """
+    client = get_openai_client(openai_api_key)
+    started = time.perf_counter()
+    first_token_at = None
+    stream = None
+    outcome = None  # "completed" or "failed"; stays None on an early stop or a non-provider error
+    try:
+        stream = get_request_scheduler().run(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=OPENAI_TEMPERATURE,
+                stream=True,
+                # The final chunk then carries the token usage
+                stream_options={"include_usage": True},
+            ),
+            count_tokens(prompt) + max_tokens,
+            on_retry=_record_retry("stream"),
+            cancel_event=cancel_event,
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                record_usage(chunk.usage, "stream")
+            if not chunk.choices:
+                continue
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    METRICS.observe("llm_first_token_seconds",
+                                    first_token_at - started, route="stream")
+                yield delta
+        outcome = "completed"
+    except CancelledError:
+        record_cancellation("stream", 0, count_tokens(prompt) + max_tokens)
+        raise
+    except Exception as e:
+        # Errors that are not the provider's fault are reported like an early stop
+        if is_provider_failure(e):
+            outcome = "failed"
+        METRICS.increment("llm_errors_total", route="stream",
+                          error=type(e).__name__)
+        raise
+    finally:
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+        elapsed = time.perf_counter() - started
+        METRICS.observe("llm_request_seconds", elapsed, route="stream")
+        first_token_seconds = None if first_token_at is None else first_token_at - started
+        if outcome is not None or first_token_seconds is not None:
+            # A stream closed early (cancelled) only tells us its time to first token
+            get_model_router().record(
+                model, elapsed if outcome == "completed" else None,
+                ok=outcome != "failed", first_token_seconds=first_token_seconds)
+
+
+def max_tokens_for(max_tokens, name):
+    """Resolves `max_tokens` (an int, a `{name: int}` dict or None) for one document."""
+    if isinstance(max_tokens, dict):
+        max_tokens = max_tokens.get(name)
+    return DEFAULT_MAX_TOKENS if max_tokens is None else max_tokens
+
+
+def _error_message(exc):
+    if isinstance(exc, CancelledError):
+        return CANCELLED_MESSAGE
+    if isinstance(exc, ValueError):
+        return str(exc)
+    return f"Error generating text: {exc}"
+
+
+def _raise_if_cancelled(cancel_event, prompt, max_tokens, route):
+    """Raises CancelledError (recording the tokens saved) before a request is sent."""
+    if cancel_event is not None and cancel_event.is_set():
+        record_cancellation(route, 0, count_tokens(prompt) + max_tokens)
+        raise CancelledError()
+
+
+def _record_stream_cancellation(prompt, max_tokens, streamed_text):
+    """Records a stream that was closed after delivering `streamed_text`."""
+    generated = count_tokens(streamed_text)
+    record_cancellation("stream", count_tokens(prompt) + generated,
+                        max(max_tokens - generated, 0))
+
+
+def generate_documents(prompts, openai_api_key, max_tokens=None, mock=False, use_cache=True, cancel_event=None):
+    """Generates several documents at once using a thread pool.
+
+    `prompts` maps a document name to its prompt and `max_tokens` is either
+    one limit for all documents or a `{name: limit}` dict. Returns a dict
+    mapping the same names to `(text, error)` tuples, where exactly one of
+    the two is set. A failure in one request does not affect the others.
+    Requests not yet sent when `cancel_event` is set are skipped and retry
+    waits end early; blocking requests already in flight cannot be aborted
+    (use `stream_documents`).
+    """
+    if mock:
+        return {name: (mock_completion(prompt), None) for name, prompt in prompts.items()}
+
+    if not openai_api_key:
+        return {name: (None, MISSING_KEY_MESSAGE) for name in prompts}
+
+    cache = get_completion_cache()
+
+    def _complete(name, prompt, doc_max_tokens):
+        _raise_if_cancelled(cancel_event, prompt, doc_max_tokens, "blocking")
+        return cached_completion(prompt, doc_max_tokens, openai_api_key, cache, use_cache, document=name,
+                                 cancel_event=cancel_event)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(prompts), 1)) as executor:
+        futures = {
+            executor.submit(_complete, name, prompt, max_tokens_for(max_tokens, name)): name
+            for name, prompt in prompts.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = (future.result(), None)
+            except Exception as e:
+                results[name] = (None, _error_message(e))
+    return results
+
+
+def stream_documents(prompts, on_update, openai_api_key, max_tokens=None, mock=False, use_cache=True, refresh_interval=0.1,
+                     cancel_event=None):
+    """Streams several documents at once and reports partial text as it arrives.
+
+    Worker threads collect the streamed tokens into per-document buffers, and
+    the calling thread calls `on_update(name, partial_text)` whenever a buffer
+    has grown (Streamlit elements may only be updated from the script thread).
+    Returns the same `{name: (text, error)}` mapping as `generate_documents`
+    once every stream has ended. Cached completions are delivered in a single
+    update.
+
+    Setting `cancel_event` aborts the open streams at their next chunk (the
+    HTTP responses are closed, so the provider stops generating); cancelled
+    documents get CANCELLED_MESSAGE as their error. The same happens if the
+    calling thread is interrupted, e.g. by a Streamlit rerun.
+    """
+    if mock:
+        results = generate_documents(prompts, openai_api_key, mock=True)
+        for name, (text, _) in results.items():
+            on_update(name, text)
+        return results
+
+    if not openai_api_key:
+        return {name: (None, MISSING_KEY_MESSAGE) for name in prompts}
+
+    cache = get_completion_cache()
+    lock = threading.Lock()
+    buffers = {name: [] for name in prompts}
+    rendered_lengths = {name: 0 for name in prompts}
+    stop = cancel_event or threading.Event()
+
+    def _stream(name, prompt, doc_max_tokens, model):
+        key = completion_cache_key(prompt, doc_max_tokens, model)
+        if use_cache:
+            # Identical concurrent streams share one upstream request; it is only
+            # closed (and the tokens saved) once every reader has stopped
+            deltas = _stream_flights.stream(
+                (key, _key_digest(openai_api_key)),
+                lambda abandoned: stream_completion(
+                    prompt, doc_max_tokens, openai_api_key, model, cancel_event=abandoned),
+                on_abandon=lambda chunks: _record_stream_cancellation(
+                    prompt, doc_max_tokens, "".join(chunks)),
+                cancel_event=stop)
+        else:
+            deltas = stream_completion(
+                prompt, doc_max_tokens, openai_api_key, model, cancel_event=stop)
+        try:
+            for delta in deltas:
+                with lock:
+                    buffers[name].append(delta)
+                if stop.is_set():
+                    if not use_cache:
+                        # Closing our own stream aborts the upstream request
+                        with lock:
+                            streamed_text = "".join(buffers[name])
+                        _record_stream_cancellation(prompt, doc_max_tokens, streamed_text)
+                    raise CancelledError()
+        except CancelledError:
+            raise
+        except Exception as e:
+            # Text already shown cannot be switched to another model mid-stream
+            with lock:
+                streamed = bool(buffers[name])
+            if streamed:
+                raise _StreamStarted() from e
+            raise
+        finally:
+            deltas.close()
+        with lock:
+            text = "".join(buffers[name]).strip()
+        if text:
+            cache.set(key, text)
+        return text
+
+    def _consume(name, prompt):
+        doc_max_tokens = max_tokens_for(max_tokens, name)
+        models = get_model_router().candidates(name, count_tokens(prompt))
+        cached = _cache_lookup(cache, [completion_cache_key(
+            prompt, doc_max_tokens, model) for model in models]) if use_cache else None
+        if cached is not None:
+            with lock:
+                buffers[name].append(cached)
+            return cached
+        _raise_if_cancelled(stop, prompt, doc_max_tokens, "stream")
+        try:
+            return _with_failover(name, models, lambda model: _stream(
+                name, prompt, doc_max_tokens, model))
+        except _StreamStarted as e:
+            raise e.__cause__
+
+    def _flush():
+        for name in prompts:
+            with lock:
+                if len(buffers[name]) == rendered_lengths[name]:
+                    continue
+                rendered_lengths[name] = len(buffers[name])
+                partial_text = "".join(buffers[name])
+            on_update(name, partial_text)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(prompts), 1)) as executor:
+        futures = {executor.submit(_consume, name, prompt): name
+                   for name, prompt in prompts.items()}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(
+                    pending, timeout=refresh_interval, return_when=FIRST_COMPLETED)
+                _flush()
+                for future in done:
+                    name = futures[future]
+                    try:
+                        text = future.result()
+                        if not text:
+                            raise ValueError(UNEXPECTED_FORMAT_MESSAGE)
+                        results[name] = (text, None)
+                    except Exception as e:
+                        results[name] = (None, _error_message(e))
+        except BaseException:
+            # The caller is gone; stop the workers instead of waiting for their streams
+            stop.set()
+            raise
+    return results
+
+
+def parse_structured_documents(raw_text):
+    """Parses a JSON completion into `{name: text}` for every document.
+
+    Raises ValueError unless every document is present as a non-empty string.
+    """
+    text = raw_text.strip()
+    if text.startswith("```"):
+        # Tolerate a fenced ```json block around the object
+        text = text.strip("`")
+        text = text[text.find("{"):]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Structured response is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Structured response is not a JSON object.")
+
+    documents = {}
+    for name in DOCUMENT_NAMES:
+        value = data.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"Structured response is missing '{name}'.")
+        documents[name] = value.strip()
+    return documents
+
+
+def generate_documents_single_call(combined_prompt, fallback_prompts, openai_api_key, max_tokens=None, mock=False, use_cache=True,
+                                   cancel_event=None):
+    """Generates all documents with one JSON-mode request.
+
+    The combined request gets the sum of the per-document limits. If the request
+    fails or its response cannot be parsed, the documents are generated with
+    the regular per-document requests (`fallback_prompts`) instead. Returns
+    the same `{name: (text, error)}` mapping as `generate_documents`.
+    `cancel_event` is checked before each request is sent and ends retry waits.
+    """
+    if mock:
+        return generate_documents(fallback_prompts, openai_api_key, mock=True)
+
+    if not openai_api_key:
+        return {name: (None, MISSING_KEY_MESSAGE) for name in fallback_prompts}
+
+    cache = get_completion_cache()
+    combined_max_tokens = sum(max_tokens_for(max_tokens, name)
+                              for name in DOCUMENT_NAMES)
+    models = get_model_router().candidates(
+        "combined", count_tokens(combined_prompt))
+    keys = {model: completion_cache_key(combined_prompt, combined_max_tokens, model)
+            for model in models}
+    try:
+        cached = _cache_lookup(cache, list(keys.values())) if use_cache else None
+        if cached is not None:
+            documents = parse_structured_documents(cached)
+        else:
+            _raise_if_cancelled(cancel_event, combined_prompt,
+                                combined_max_tokens, "structured")
+
+            def _request(model):
+                def _fetch():
+                    return request_completion(
+                        combined_prompt, combined_max_tokens, openai_api_key,
+                        response_format={"type": "json_object"}, model=model,
+                        cancel_event=cancel_event)
+                if use_cache:
+                    raw_text, _ = _completion_flights.do(
+                        (keys[model], _key_digest(openai_api_key)), _fetch)
+                else:
+                    raw_text = _fetch()
+                return model, raw_text
+
+            model, raw_text = _with_failover("combined", models, _request)
+            documents = parse_structured_documents(raw_text)
+            # Only responses that parsed are worth caching
+            cache.set(keys[model], raw_text)
+    except CancelledError:
+        return {name: (None, CANCELLED_MESSAGE) for name in fallback_prompts}
+    except Exception:
+        return generate_documents(fallback_prompts, openai_api_key, max_tokens=max_tokens, use_cache=use_cache,
+                                  cancel_event=cancel_event)
+    return {name: (documents[name], None) for name in DOCUMENT_NAMES}
+
+
+def run_generation_job(payload, report_progress, openai_api_key, cancel_event=None, refresh_interval=0.5):
+    """Runs a queued generation job (see `job_queue.JobQueue`).
+
+    `payload` holds the prompts and options but never the API key. Partial
+    text is passed to `report_progress({name: partial_text})` at most every
+    `refresh_interval` seconds per document; `cancel_event` aborts the
+    open streams. Returns `{name: [text, error]}`.
+    """
+    max_tokens = payload["max_tokens"]
+    mock = payload.get("mock", False)
+    use_cache = payload.get("use_cache", True)
+    if payload.get("single_call"):
+        results = generate_documents_single_call(
+            payload["combined_prompt"], payload["prompts"], openai_api_key,
+            max_tokens=max_tokens, mock=mock, use_cache=use_cache, cancel_event=cancel_event)
+    else:
+        partial = {}
+
+        def _on_update(name, text):
+            partial[name] = text
+            report_progress(dict(partial))
+
+        results = stream_documents(
+            payload["prompts"], _on_update, openai_api_key, max_tokens=max_tokens,
+            mock=mock, use_cache=use_cache, refresh_interval=refresh_interval,
+            cancel_event=cancel_event)
+    return {name: list(result) for name, result in results.items()}
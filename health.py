@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import generation
+from metrics import METRICS
+
+# Optional background probe of the OpenAI API (enable with APP_HEALTH_PROBE=1)
+HEALTH_PROBE_ENABLED = os.getenv(
+    "APP_HEALTH_PROBE", "").lower() in ("1", "true", "yes")
+HEALTH_PROBE_INTERVAL_SECONDS = float(
+    os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "60"))
+# Successful probes slower than this report the provider as degraded
+HEALTH_PROBE_DEGRADED_SECONDS = float(
+    os.getenv("HEALTH_PROBE_DEGRADED_SECONDS", "2"))
+
+
+class HealthProbe:
+    """Checks provider reachability and latency on a schedule from a daemon thread.
+
+    Each probe is one `generation.check_api_key` call, so a successful probe
+    also refreshes the shared API key validation cache. `status()` returns
+    the latest result: "ok", "degraded", "down" or "unknown" (no key yet).
+    """
+
+    def __init__(self, get_api_key, interval_seconds=HEALTH_PROBE_INTERVAL_SECONDS,
+                 degraded_seconds=HEALTH_PROBE_DEGRADED_SECONDS):
+        self.get_api_key = get_api_key
+        self.interval_seconds = interval_seconds
+        self.degraded_seconds = degraded_seconds
+        self._lock = threading.Lock()
+        self._status = {"state": "unknown", "latency_seconds": None,
+                        "checked_at": None, "message": "Not checked yet."}
+        self._thread = None
+
+    def probe_once(self):
+        try:
+            api_key = self.get_api_key()
+        except Exception:
+            api_key = None
+        if not api_key:
+            status = {"state": "unknown", "latency_seconds": None,
+                      "message": "No API key configured."}
+        else:
+            started = time.perf_counter()
+            ok, message, definitive = generation.check_api_key(api_key)
+            latency = time.perf_counter() - started
+            if definitive:
+                generation.remember_api_key_validation(api_key, ok, message)
+            if not ok:
+                state = "down"
+            elif latency > self.degraded_seconds:
+                state = "degraded"
+            else:
+                state = "ok"
+            METRICS.observe("provider_probe_seconds", latency)
+            METRICS.increment("provider_probes_total", state=state)
+            status = {"state": state, "latency_seconds": latency,
+                      "message": message}
+        status["checked_at"] = time.time()
+        with self._lock:
+            self._status = status
+        return status
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def start(self):
+        def _run():
+            while True:
+                self.probe_once()
+                time.sleep(self.interval_seconds)
+
+        self._thread = threading.Thread(
+            target=_run, name="provider-health-probe", daemon=True)
+        self._thread.start()
+
+
+_probe_lock = threading.Lock()
+_probe = None
+
+
+def start_health_probe(get_api_key, interval_seconds=HEALTH_PROBE_INTERVAL_SECONDS):
+    """Starts (once per process) the background probe and returns it."""
+    global _probe
+    with _probe_lock:
+        if _probe is None:
+            _probe = HealthProbe(get_api_key, interval_seconds)
+            _probe.start()
+        return _probe
+
+
+def get_health_probe():
+    """Returns the running probe, or None if it was never started."""
+    return _probe
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+import time
+from io import BytesIO
+
+from metrics import METRICS, timed_import
+from pdf_export import BytesLRUCache
+
+# Thumbnails are scaled to fit this box (pixels) and saved as JPEG
+THUMBNAIL_MAX_PIXELS = int(os.getenv("THUMBNAIL_MAX_PIXELS", "800"))
+THUMBNAIL_JPEG_QUALITY = int(os.getenv("THUMBNAIL_JPEG_QUALITY", "80"))
+# Process-wide thumbnail cache bounds (thumbnails are small, typically < 100 KB)
+THUMBNAIL_CACHE_MAX_ENTRIES = int(
+    os.getenv("THUMBNAIL_CACHE_MAX_ENTRIES", "256"))
+THUMBNAIL_CACHE_MAX_BYTES = int(
+    os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class ImageProcessingError(Exception):
+    """Raised when an uploaded image cannot be decoded."""
+
+
+_cache_lock = threading.Lock()
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache():
+    """Returns the process-wide thumbnail cache shared by every session."""
+    global _thumbnail_cache
+    with _cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = BytesLRUCache(
+                THUMBNAIL_CACHE_MAX_ENTRIES, THUMBNAIL_CACHE_MAX_BYTES)
+        return _thumbnail_cache
+
+
+def image_content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_thumbnail(data, max_pixels=THUMBNAIL_MAX_PIXELS, quality=THUMBNAIL_JPEG_QUALITY):
+    """Decodes an uploaded PNG/JPEG and returns a downscaled JPEG as bytes.
+
+    JPEGs are decoded at a reduced scale where possible (`draft`), so a
+    multi-megapixel phone photo is never fully expanded in memory. EXIF
+    rotation is applied and transparency is flattened onto white.
+    """
+    Image = timed_import("PIL.Image")
+    ImageOps = timed_import("PIL.ImageOps")
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.draft("RGB", (max_pixels, max_pixels))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_pixels, max_pixels), Image.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            out = BytesIO()
+            img.save(out, format="JPEG", quality=quality,
+                     optimize=True, progressive=True)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageProcessingError(
+            "Could not read the image. Please upload a valid PNG or JPEG file.") from e
+
+
+def get_thumbnail(data, content_hash=None):
+    """Returns `(thumbnail_bytes, content_hash)` for an upload, decoding it only on a cache miss.
+
+    `content_hash` is the hash of the uploaded bytes, not of the thumbnail.
+    """
+    content_hash = content_hash or image_content_hash(data)
+    cache = get_thumbnail_cache()
+    thumbnail = cache.get(content_hash)
+    if thumbnail is None:
+        started = time.perf_counter()
+        thumbnail = make_thumbnail(data)
+        METRICS.observe("image_thumbnail_seconds",
+                        time.perf_counter() - started)
+        METRICS.observe("image_upload_bytes", len(data))
+        METRICS.observe("image_thumbnail_bytes", len(thumbnail))
+        cache.set(content_hash, thumbnail)
+    return thumbnail, content_hash
@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import METRICS
+
+# Queued jobs are stored here so they survive reruns, disconnects and restarts
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3"))
+# Jobs processed at once (each generation job makes up to three concurrent requests)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Running jobs per owner; an owner's further jobs wait while others get a turn
+JOB_MAX_RUNNING_PER_OWNER = int(os.getenv("JOB_MAX_RUNNING_PER_OWNER", "1"))
+# Finished jobs (and their results) are kept this long for sessions to pick up
+JOB_RETENTION_SECONDS = float(
+    os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# A running job whose process has not renewed its lease for this long is
+# considered lost (e.g. the process died) and is queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# How often expired leases are requeued and old jobs purged
+JOB_MAINTENANCE_INTERVAL_SECONDS = float(
+    os.getenv("JOB_MAINTENANCE_INTERVAL_SECONDS", "60"))
+
+# Job states; "queued" and "running" are active, the rest are final
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobQueue:
+    """Durable job queue in an SQLite file, processed by a pool of worker threads.
+
+    Jobs survive script reruns, disconnects and restarts. Each running job
+    holds a lease that its process renews every few seconds; a job whose
+    lease expired (its process died) is queued again, up to `max_attempts`.
+    Several processes can share one queue file without taking over each
+    other's live jobs. At most `workers` jobs run at once and each owner (a
+    user session) has at most `max_running_per_owner` of them; among the
+    owners with capacity, the one served least recently goes first, so one
+    busy user cannot starve the others.
+
+    `handler(payload, report_progress, cancel_event)` does the work and
+    returns a JSON-serialisable result; `report_progress(progress)` stores
+    partial output that pollers can show while the job runs, and
+    `cancel_event` is set when the job is cancelled so the handler can stop
+    early (also when another process cancelled it: the next progress report
+    notices).
+    """
+
+    def __init__(self, path, handler, workers=JOB_WORKERS,
+                 max_running_per_owner=JOB_MAX_RUNNING_PER_OWNER, max_attempts=3,
+                 retention_seconds=JOB_RETENTION_SECONDS, poll_seconds=0.5,
+                 lease_seconds=JOB_LEASE_SECONDS,
+                 maintenance_interval_seconds=JOB_MAINTENANCE_INTERVAL_SECONDS):
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.max_running_per_owner = max_running_per_owner
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.maintenance_interval_seconds = maintenance_interval_seconds
+        # Identifies this process's leases in the shared queue file
+        self.instance_id = uuid.uuid4().hex
+        self._next_maintenance = 0.0
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._changes = 0  # bumped (under _wakeup) whenever a job may have become claimable
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                worker TEXT,
+                lease_until REAL
+            )"""
+        )
+        # Queue files created before leases existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("worker", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, status)")
+        self._conn.commit()
+        self._threads = []
+        self._cancel_events = {}  # job id -> Event, for jobs running in this process
+
+    def start(self):
+        # Jobs of a process that died go back into the queue
+        self._requeue_expired()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(
+            target=self._renew_leases, name="job-leases", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def enqueue(self, owner, payload):
+        """Adds a job and returns its id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, owner, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, owner, QUEUED, json.dumps(payload), time.time()))
+            self._conn.commit()
+        METRICS.increment("jobs_enqueued_total")
+        self._notify()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict (with its queue position while queued), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, owner, status, payload, progress, result, error, attempts, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[2] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?",
+                    (QUEUED, row[8])).fetchone()[0]
+        keys = ("id", "owner", "status", "payload", "progress", "result", "error",
+                "attempts", "created_at", "started_at", "finished_at")
+        job = dict(zip(keys, row))
+        for field in ("payload", "progress", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        job["position"] = position
+        return job
+
+    def cancel(self, job_id):
+        """Cancels a job that has not finished; returns True if it was active.
+
+        A running job is signalled to stop, and whatever it returns is discarded.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING))
+            self._conn.commit()
+            cancel_event = self._cancel_events.get(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+        if cursor.rowcount > 0:
+            METRICS.increment("jobs_cancelled_total")
+        return cursor.rowcount > 0
+
+    def is_cancelled(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row[0] == CANCELLED
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _claim(self):
+        """Marks the next fair job as running and returns `(id, payload)`, or None.
+
+        The pick and the update run in one write transaction, so two processes
+        sharing the queue file cannot both claim the same job.
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                # Another process holds the write lock; try again on the next poll
+                return None
+            row = self._conn.execute(
+                """SELECT j.id, j.payload FROM jobs j
+                   WHERE j.status = ?
+                     AND (SELECT COUNT(*) FROM jobs r
+                          WHERE r.owner = j.owner AND r.status = ?) < ?
+                   ORDER BY (SELECT COALESCE(MAX(s.started_at), 0) FROM jobs s
+                             WHERE s.owner = j.owner), j.created_at
+                   LIMIT 1""",
+                (QUEUED, RUNNING, self.max_running_per_owner)).fetchone()
+            if row is None:
+                self._conn.rollback()
+                return None
+            now = time.time()
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                "worker = ?, lease_until = ? WHERE id = ? AND status = ?",
+                (RUNNING, now, self.instance_id, now + self.lease_seconds, row[0], QUEUED))
+            self._conn.commit()
+            if cursor.rowcount == 0:
+                return None
+            self._cancel_events[row[0]] = threading.Event()
+        return row[0], json.loads(row[1])
+
+    def _update_running(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND worker = ?",
+                (*fields.values(), job_id, RUNNING, self.instance_id))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def _requeue_expired(self):
+        """Queues running jobs whose lease expired again (or fails them after `max_attempts`)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = CASE WHEN attempts >= ? THEN 'Interrupted too many times.' ELSE error END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END, "
+                "worker = NULL, lease_until = NULL "
+                "WHERE status = ? AND COALESCE(lease_until, 0) < ?",
+                (self.max_attempts, FAILED, QUEUED, self.max_attempts, self.max_attempts,
+                 time.time(), RUNNING, time.time()))
+            self._conn.commit()
+        if cursor.rowcount > 0:
+            self._notify()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE status = ? AND worker = ?",
+                    (time.time() + self.lease_seconds, RUNNING, self.instance_id))
+                self._conn.commit()
+
+    def _purge_old(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINAL_STATES, time.time() - self.retention_seconds))
+            self._conn.commit()
+
+    def _maintain(self):
+        """Requeues lost jobs and purges old ones, at most once per maintenance interval."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_maintenance:
+                return
+            self._next_maintenance = now + self.maintenance_interval_seconds
+        self._requeue_expired()
+        self._purge_old()
+
+    def _notify(self):
+        with self._wakeup:
+            self._changes += 1
+            self._wakeup.notify()
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                seen = self._changes
+            claimed = self._claim()
+            if claimed is None:
+                self._maintain()
+                with self._wakeup:
+                    if self._changes == seen:
+                        self._wakeup.wait(self.poll_seconds)
+                continue
+
+            job_id, payload = claimed
+            started = time.perf_counter()
+            cancel_event = self._cancel_events[job_id]
+
+            def report_progress(progress, job_id=job_id, cancel_event=cancel_event):
+                if not self._update_running(job_id, progress=json.dumps(progress)):
+                    cancel_event.set()
+
+            try:
+                result = self.handler(payload, report_progress, cancel_event)
+                finished = self._update_running(
+                    job_id, status=DONE, result=json.dumps(result), finished_at=time.time())
+                outcome = DONE if finished else CANCELLED
+            except Exception as e:
+                failed = self._update_running(
+                    job_id, status=FAILED, error=str(e), finished_at=time.time())
+                outcome = FAILED if failed else CANCELLED
+            finally:
+                with self._lock:
+                    self._cancel_events.pop(job_id, None)
+            METRICS.observe("job_seconds", time.perf_counter() -
+                            started, outcome=outcome)
+            # A finished job frees a slot for the same owner's next job
+            self._notify()
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS, quantile
+from pdf_export import DEFAULT_PDF_BACKEND, PDF_BACKENDS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+FAKE_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai.py")
+POLL_SECONDS = 0.25
+
+# AppTest swaps Streamlit's global runtime on every run, so script runs cannot
+# overlap; the generation jobs and PDF renders they start still run concurrently
+_app_run_lock = threading.Lock()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server_process(server_args):
+    """Runs fake_openai.py in a child process (so its memory is not counted) and returns `(proc, base_url)`."""
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, FAKE_SERVER_PATH, "--port", str(port), *server_args],
+                            stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1).read()
+            return proc, base_url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("The fake OpenAI server did not start.")
+
+
+def fake_server_stats(base_url):
+    try:
+        with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/stats", timeout=5) as response:
+            return json.load(response)
+    except OSError:
+        return None
+
+
+class MemorySampler:
+    """Samples this process's resident memory (the app "server") in a background thread."""
+
+    def __init__(self, interval_seconds=0.5):
+        self.interval_seconds = interval_seconds
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    @staticmethod
+    def rss_bytes():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.rss_bytes()
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return {"start_rss_bytes": self.samples[0] if self.samples else None,
+                "peak_rss_bytes": max(self.samples) if self.samples else None,
+                "end_rss_bytes": self.samples[-1] if self.samples else None}
+
+
+def _run(at):
+    with _app_run_lock:
+        at.run()
+
+
+def _wait_until(at, condition, timeout):
+    """Reruns the app (as the page's polling would) until `condition(at)` holds; returns success."""
+    deadline = time.perf_counter() + timeout
+    while not condition(at):
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(POLL_SECONDS)
+        _run(at)
+    return True
+
+
+def _documents_ready(at):
+    return all(at.session_state[f"generated_{name}"]
+               for name in ("resume", "cover_letter", "portfolio"))
+
+
+def run_session(index, args):
+    """Simulates one user: fill in the form, Generate, then build the PDF. Returns timings.
+
+    Generation runs as a background job and the PDF in the render pool,
+    with the page polling both, as in the default app settings.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    result = {"session": index, "errors": []}
+    started = time.perf_counter()
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    _run(at)
+    # Unique inputs per session, so every session really calls the (fake) API
+    at.text_area(key="user_skills").set_value(f"Python, SQL, Streamlit, load test user {index}")
+    at.checkbox(key="use_mock").uncheck()
+    at.checkbox(key="background_generation").check()
+    at.checkbox(key="pdf_on_demand").check()
+    at.selectbox(key="pdf_backend").set_value(args.pdf_backend)
+    _run(at)
+
+    generate = next(b for b in at.button if b.label.startswith("Generate Content"))
+    generate_started = time.perf_counter()
+    generate.click()
+    _run(at)
+    if not _wait_until(at, _documents_ready, args.timeout):
+        result["errors"].append("generation timed out")
+    result["generate_seconds"] = time.perf_counter() - generate_started
+    result["errors"] += [error.value for error in at.error]
+
+    if _documents_ready(at):
+        pdf_started = time.perf_counter()
+        at.button(key="build_full_portfolio_pdf").click()
+        _run(at)
+        if _wait_until(at, lambda at: "pdf_blob_key" in at.session_state, args.timeout):
+            result["pdf_seconds"] = time.perf_counter() - pdf_started
+        else:
+            result["errors"].append("PDF build timed out")
+    result["session_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _latency_summary(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {"count": len(ordered), "mean": statistics.fmean(ordered),
+            "p50": quantile(ordered, 0.5), "p95": quantile(ordered, 0.95),
+            "p99": quantile(ordered, 0.99), "max": ordered[-1]}
+
+
+def run_load_test(args):
+    sampler = MemorySampler()
+    sampler.start()
+    started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = []
+        for index in range(args.sessions):
+            futures.append(executor.submit(run_session, index, args))
+            if args.ramp_seconds:
+                time.sleep(args.ramp_seconds / args.sessions)
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"errors": [f"{type(e).__name__}: {e}"]})
+    wall_seconds = time.perf_counter() - started
+    memory = sampler.stop()
+
+    completed = [r for r in results if not r["errors"]]
+    return {
+        "sessions": args.sessions,
+        "completed_sessions": len(completed),
+        "failed_sessions": len(results) - len(completed),
+        "wall_seconds": wall_seconds,
+        "throughput_sessions_per_second": len(completed) / wall_seconds if wall_seconds else 0.0,
+        "generate_seconds": _latency_summary([r["generate_seconds"] for r in completed]),
+        "pdf_seconds": _latency_summary([r["pdf_seconds"] for r in completed if "pdf_seconds" in r]),
+        "session_seconds": _latency_summary([r["session_seconds"] for r in completed]),
+        "memory": memory,
+        "errors": [error for r in results for error in r["errors"]][:20],
+        "sessions_detail": results,
+    }
+
+
+def _print_summary(report):
+    print(f"\n{report['completed_sessions']}/{report['sessions']} sessions completed in "
+          f"{report['wall_seconds']:.1f}s ({report['throughput_sessions_per_second']:.2f} sessions/s)")
+    for stage in ("generate_seconds", "pdf_seconds", "session_seconds"):
+        summary = report[stage]
+        if summary:
+            print(f"{stage:>17}  p50 {summary['p50']:7.2f}s  p95 {summary['p95']:7.2f}s"
+                  f"  p99 {summary['p99']:7.2f}s  max {summary['max']:7.2f}s")
+    memory = report["memory"]
+    if memory["peak_rss_bytes"]:
+        print(f"{'server memory':>17}  start {memory['start_rss_bytes'] / 2**20:7.1f} MB"
+              f"  peak {memory['peak_rss_bytes'] / 2**20:7.1f} MB"
+              f"  end {memory['end_rss_bytes'] / 2**20:7.1f} MB")
+    for error in report["errors"]:
+        print(f"  error: {error}")
+
+
+def main(argv=None):
+    from fake_openai import add_config_arguments
+
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent app sessions (Generate + PDF) against a local fake OpenAI server.")
+    parser.add_argument("--sessions", type=int, default=10,
+                        help="Concurrent simulated sessions (default: 10).")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0,
+                        help="Spread the session starts over this many seconds (default: 0).")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Per-step timeout in seconds (default: 120).")
+    parser.add_argument("--pdf-backend", choices=PDF_BACKENDS, default=DEFAULT_PDF_BACKEND,
+                        help=f"PDF renderer selected in each session (default: {DEFAULT_PDF_BACKEND}).")
+    parser.add_argument("--base-url", default=None,
+                        help="Use an already running (fake) server instead of starting one.")
+    parser.add_argument("--output", default="load_test.json",
+                        help="Where to save the results as JSON (default: load_test.json).")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server_args = ["--first-token-median", str(args.first_token_median),
+                       "--latency-sigma", str(args.latency_sigma),
+                       "--token-seconds", str(args.token_seconds),
+                       "--completion-tokens", str(args.completion_tokens),
+                       "--rate-limit-rate", str(args.rate_limit_rate),
+                       "--error-rate", str(args.error_rate)]
+        if args.seed is not None:
+            server_args += ["--seed", str(args.seed)]
+        server, base_url = start_fake_server_process(server_args)
+
+    # The app reads these at import time; fresh caches so every session makes real requests
+    scratch = tempfile.mkdtemp(prefix="load-test-")
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": os.environ.get("LOAD_TEST_API_KEY", "fake-key"),
+        "COMPLETION_CACHE_PATH": os.path.join(scratch, "completions.sqlite3"),
+        "JOB_QUEUE_PATH": os.path.join(scratch, "jobs.sqlite3"),
+    })
+    try:
+        report = run_load_test(args)
+    finally:
+        server_stats = fake_server_stats(base_url)
+        if server is not None:
+            server.terminate()
+            server.wait()
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "base_url": base_url,
+            "pdf_backend": args.pdf_backend,
+        },
+        **report,
+        "fake_server": server_stats,
+        "app_counters": [counter for counter in METRICS.snapshot()["counters"]
+                         if counter["name"].startswith(("llm_", "model_", "jobs_"))],
+    }
+    _print_summary(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved the results to {args.output}")
+    return 0 if report["failed_sessions"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
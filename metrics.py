@@ -0,0 +1,233 @@
+import importlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Recent observations kept per timer for percentile estimates
+RESERVOIR_SIZE = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label_value(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(max(math.ceil(q * len(sorted_values)) - 1, 0),
+                len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class _Summary:
+    __slots__ = ("count", "total", "maximum", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        self.recent.append(value)
+
+
+class MetricsRegistry:
+    """Thread-safe, in-process counters and summaries with JSON/Prometheus export.
+
+    Counters only go up (`increment`); summaries (`observe`) keep a count, a
+    sum, the maximum and the most recent values for p50/p95/p99.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary()
+            summary.add(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the wall time of the `with` block (in seconds) as `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Returns all metrics as a JSON-serialisable dict."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            summaries = []
+            for (name, labels), summary in sorted(self._summaries.items()):
+                recent = sorted(summary.recent)
+                entry = {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": summary.count,
+                    "sum": summary.total,
+                    "max": summary.maximum,
+                }
+                for q in QUANTILES:
+                    entry[f"p{int(q * 100)}"] = quantile(recent, q)
+                summaries.append(entry)
+        return {"timestamp": time.time(), "counters": counters, "summaries": summaries}
+
+    def to_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for counter in snapshot["counters"]:
+            name = counter["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            label_key = _label_key(counter["labels"])
+            lines.append(
+                f"{name}{_format_labels(label_key)} {counter['value']}")
+        for summary in snapshot["summaries"]:
+            name = summary["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            label_key = _label_key(summary["labels"])
+            for q in QUANTILES:
+                lines.append(
+                    f"{name}{_format_labels(label_key, [('quantile', q)])} {summary[f'p{int(q * 100)}']}")
+            lines.append(
+                f"{name}_sum{_format_labels(label_key)} {summary['sum']}")
+            lines.append(
+                f"{name}_count{_format_labels(label_key)} {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_files(self, path_prefix):
+        """Writes `<prefix>.prom` and `<prefix>.json` atomically (for textfile scrapers)."""
+        directory = os.path.dirname(os.path.abspath(path_prefix))
+        os.makedirs(directory, exist_ok=True)
+        for suffix, content in (
+            (".prom", self.to_prometheus()),
+            (".json", json.dumps(self.snapshot(), indent=2)),
+        ):
+            tmp_path = f"{path_prefix}{suffix}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path_prefix + suffix)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+# Process-wide registry shared by every session
+METRICS = MetricsRegistry()
+
+_exporter_lock = threading.Lock()
+_exporter_thread = None
+
+
+def start_file_exporter(path_prefix, interval_seconds=15.0):
+    """Starts (once per process) a daemon thread that rewrites the metric files periodically."""
+    global _exporter_thread
+    with _exporter_lock:
+        if _exporter_thread is not None:
+            return
+
+        def _run():
+            while True:
+                try:
+                    METRICS.write_files(path_prefix)
+                except OSError:
+                    pass
+                time.sleep(interval_seconds)
+
+        _exporter_thread = threading.Thread(
+            target=_run, name="metrics-exporter", daemon=True)
+        _exporter_thread.start()
+
+
+def record_pdf_render(timings, pdf_size):
+    """Records the per-stage timings and output size of one PDF render."""
+    for stage, seconds in timings.items():
+        METRICS.observe("pdf_stage_seconds", seconds, stage=stage)
+    METRICS.observe("pdf_bytes", pdf_size)
+
+
+def record_usage(usage, route):
+    """Records prompt/completion token counts from a response `usage` object."""
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(field) if isinstance(
+            usage, dict) else getattr(usage, field, None)
+        if value:
+            METRICS.increment(f"llm_{field}_total", value, route=route)
+
+
+def record_cancellation(route, spent_tokens, saved_tokens):
+    """Records an aborted completion: tokens already billed and tokens it no longer uses.
+
+    `saved_tokens` is an upper bound (the unused part of the request's
+    `max_tokens`, plus the prompt if it was never sent).
+    """
+    METRICS.increment("llm_cancellations_total", route=route)
+    if spent_tokens:
+        METRICS.increment("llm_cancelled_tokens_total",
+                          spent_tokens, route=route)
+    if saved_tokens:
+        METRICS.increment("llm_saved_tokens_total", saved_tokens, route=route)
+
+
+def timed_import(module_name):
+    """Imports `module_name` on first use and records how long the cold import took.
+
+    Heavy optional stacks (the OpenAI SDK, xhtml2pdf, reportlab) are loaded
+    through this instead of at module top, so startup does not pay for them
+    and the deferred cost shows up as `import_seconds{module=...}`.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    METRICS.observe("import_seconds", time.perf_counter() -
+                    started, module=module_name)
+    return module
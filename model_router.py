@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import METRICS, quantile
+
+# Per-route model lists, tried in order. Each route is a list of tiers by
+# prompt size: the first tier whose `max_prompt_tokens` fits the prompt (or
+# that has no limit) applies. Override with MODEL_ROUTES (JSON, same shape).
+DEFAULT_MODEL_ROUTES = {
+    # Structured content; large inputs go to the long-context model
+    "resume": [
+        {"max_prompt_tokens": 3000, "models": ["gpt-3.5-turbo", "gpt-4o-mini"]},
+        {"models": ["gpt-4o-mini", "gpt-4o"]},
+    ],
+    # The document where writing quality shows most
+    "cover_letter": [
+        {"models": ["gpt-4o", "gpt-4o-mini"]},
+    ],
+    # A short summary: the fastest model
+    "portfolio": [
+        {"max_prompt_tokens": 3000, "models": ["gpt-4o-mini", "gpt-3.5-turbo"]},
+        {"models": ["gpt-4o-mini"]},
+    ],
+    # All three documents in one JSON-mode request
+    "combined": [
+        {"models": ["gpt-4o-mini", "gpt-4o"]},
+    ],
+}
+
+MODEL_ROUTING_ENABLED = os.getenv(
+    "MODEL_ROUTING", "1").lower() not in ("0", "false", "no")
+MODEL_ROUTES = json.loads(os.getenv("MODEL_ROUTES") or "null") or DEFAULT_MODEL_ROUTES
+# Latency SLOs (p95, seconds): whole blocking requests and time to first streamed token
+MODEL_LATENCY_SLO_SECONDS = float(
+    os.getenv("MODEL_LATENCY_SLO_SECONDS", "30"))
+MODEL_FIRST_TOKEN_SLO_SECONDS = float(
+    os.getenv("MODEL_FIRST_TOKEN_SLO_SECONDS", "5"))
+MODEL_ERROR_RATE_SLO = float(os.getenv("MODEL_ERROR_RATE_SLO", "0.25"))
+# Recent requests per model used to judge its health
+MODEL_HEALTH_WINDOW = int(os.getenv("MODEL_HEALTH_WINDOW", "50"))
+MODEL_HEALTH_MIN_SAMPLES = int(os.getenv("MODEL_HEALTH_MIN_SAMPLES", "5"))
+# A model that breached an SLO is tried last for this long, then gets a fresh window
+MODEL_COOLDOWN_SECONDS = float(os.getenv("MODEL_COOLDOWN_SECONDS", "120"))
+
+# Errors that another model will not fix (bad key, no access to the project)
+_NO_FAILOVER_STATUS_CODES = {401, 403}
+# Errors without a status code that still mean the provider failed
+_PROVIDER_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "Timeout", "ServiceUnavailableError"}
+
+
+def should_fail_over(exc):
+    """Returns True if a request that failed with `exc` is worth retrying on another model."""
+    return getattr(exc, "status_code", None) not in _NO_FAILOVER_STATUS_CODES
+
+
+def is_provider_failure(exc):
+    """Returns True if `exc` says something about the model's health (5xx, timeouts, connection errors).
+
+    Auth errors, rate limits, bad requests and cancellations are the
+    caller's problem and must not degrade a model.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 408
+    return type(exc).__name__ in _PROVIDER_ERROR_NAMES
+
+
+class _ModelHealth:
+    __slots__ = ("latencies", "first_tokens", "outcomes", "degraded_until")
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.first_tokens = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.degraded_until = 0.0
+
+
+class ModelRouter:
+    """Picks the models to try for a document and tracks each model's health.
+
+    Documents without a route (and every document when routing is disabled)
+    use `default_model` alone.
+
+    `candidates()` returns the route's models in order, with any model
+    that is cooling down after an SLO breach moved to the back (it is still
+    tried if everything else fails). Callers report every request with
+    `record()`; when a model's p95 latency, p95 time to first token or
+    error rate over the last `window` requests breaches its SLO, the model
+    cools down for `cooldown_seconds` and is then judged on a fresh window
+    (samples recorded during the cooldown are dropped when it ends).
+    Only report failures for which `is_provider_failure` holds.
+    """
+
+    def __init__(self, routes, default_model, enabled=True,
+                 latency_slo=MODEL_LATENCY_SLO_SECONDS,
+                 first_token_slo=MODEL_FIRST_TOKEN_SLO_SECONDS,
+                 error_rate_slo=MODEL_ERROR_RATE_SLO, window=MODEL_HEALTH_WINDOW,
+                 min_samples=MODEL_HEALTH_MIN_SAMPLES, cooldown_seconds=MODEL_COOLDOWN_SECONDS):
+        self.routes = routes
+        self.default_model = default_model
+        self.enabled = enabled
+        self.latency_slo = latency_slo
+        self.first_token_slo = first_token_slo
+        self.error_rate_slo = error_rate_slo
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._health = {}
+
+    def config(self):
+        """Returns the routing settings (part of a document's input fingerprint)."""
+        return {"default_model": self.default_model,
+                "routes": self.routes if self.enabled else None}
+
+    def route(self, document, prompt_tokens=0):
+        """Returns the configured models for a document and prompt size, primary first."""
+        if not self.enabled or document not in self.routes:
+            return [self.default_model]
+        for tier in self.routes[document]:
+            limit = tier.get("max_prompt_tokens")
+            if limit is None or prompt_tokens <= limit:
+                return list(tier["models"])
+        return list(self.routes[document][-1]["models"])
+
+    def candidates(self, document, prompt_tokens=0):
+        """Returns the models to try in order: healthy ones first, cooling-down ones last."""
+        models = self.route(document, prompt_tokens)
+        now = time.monotonic()
+        with self._lock:
+            cooling = {model for model in models
+                       if model in self._health and self._health[model].degraded_until > now}
+        return [m for m in models if m not in cooling] + [m for m in models if m in cooling]
+
+    def _health_for(self, model):
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = _ModelHealth(self.window)
+        return health
+
+    def record(self, model, seconds=None, ok=True, first_token_seconds=None):
+        """Reports one request: its total latency, outcome and (streams) time to first token."""
+        now = time.monotonic()
+        with self._lock:
+            health = self._health_for(model)
+            if health.degraded_until and health.degraded_until <= now:
+                # The cooldown is over: judge the model on a fresh window
+                health.degraded_until = 0.0
+                health.latencies.clear()
+                health.first_tokens.clear()
+                health.outcomes.clear()
+            health.outcomes.append(ok)
+            if ok and seconds is not None:
+                health.latencies.append(seconds)
+            if first_token_seconds is not None:
+                health.first_tokens.append(first_token_seconds)
+            breach = self._breach_locked(health)
+            if breach and not health.degraded_until:
+                health.degraded_until = now + self.cooldown_seconds
+                health.latencies.clear()
+                health.first_tokens.clear()
+                health.outcomes.clear()
+            else:
+                breach = None
+        if breach:
+            METRICS.increment("model_degraded_total", model=model, reason=breach)
+
+    def _breach_locked(self, health):
+        if len(health.outcomes) >= self.min_samples:
+            error_rate = health.outcomes.count(False) / len(health.outcomes)
+            if error_rate > self.error_rate_slo:
+                return "error_rate"
+        if len(health.latencies) >= self.min_samples and \
+                quantile(sorted(health.latencies), 0.95) > self.latency_slo:
+            return "latency"
+        if len(health.first_tokens) >= self.min_samples and \
+                quantile(sorted(health.first_tokens), 0.95) > self.first_token_slo:
+            return "first_token"
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = {}
+            for model, health in self._health.items():
+                latencies = sorted(health.latencies)
+                first_tokens = sorted(health.first_tokens)
+                stats[model] = {
+                    "requests": len(health.outcomes),
+                    "error_rate": (health.outcomes.count(False) / len(health.outcomes)
+                                   if health.outcomes else 0.0),
+                    "p50_seconds": quantile(latencies, 0.5),
+                    "p95_seconds": quantile(latencies, 0.95),
+                    "first_token_p50_seconds": quantile(first_tokens, 0.5),
+                    "first_token_p95_seconds": quantile(first_tokens, 0.95),
+                    "cooldown_seconds_left": max(health.degraded_until - now, 0.0),
+                }
+        return stats
@@ -0,0 +1,286 @@
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from pdf_export import BLUE, DARK_BLUE, GREY, TEAL, image_display_size, is_safe_link
+
+# Page geometry and type sizes, matching PDF_CSS in pdf_export
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 0.75 * 72
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+LINE_HEIGHT = 1.4
+LIST_INDENT = 15
+BULLET = '•'
+
+TEXT_COLOR = HexColor('#2c3e50')
+LINK_COLOR = HexColor('#0000ff')
+RULE_COLOR = HexColor('#dddddd')
+
+# (font, size, color) per block style
+STYLES = {
+    'body': ('Helvetica', 11, TEXT_COLOR),
+    'bold': ('Helvetica-Bold', 11, TEXT_COLOR),
+    'name': ('Helvetica-Bold', 18, HexColor(BLUE)),
+    'contact': ('Helvetica', 10, HexColor(GREY)),
+    'section': ('Helvetica-Bold', 14, HexColor(DARK_BLUE)),
+    'project': ('Helvetica-Bold', 12, HexColor(TEAL)),
+    'link': ('Helvetica-Oblique', 10, LINK_COLOR),
+}
+
+
+@lru_cache(maxsize=16384)
+def _text_width(text, font, size):
+    return stringWidth(text, font, size)
+
+
+def wrap_text(text, font, size, width, first_width=None):
+    """Greedily wraps `text` into lines no wider than `width` points.
+
+    The first line may be given its own width (e.g. after a bold label).
+    Each word is measured once (standard fonts have no kerning, so widths
+    add up); words longer than a whole line are broken between characters.
+    """
+    lines = []
+    current = []
+    used = 0.0
+    space = _text_width(' ', font, size)
+    limit = width if first_width is None else first_width
+    for word in text.split():
+        word_width = _text_width(word, font, size)
+        needed = word_width + space if current else word_width
+        if used + needed <= limit:
+            current.append(word)
+            used += needed
+            continue
+        if current:
+            lines.append(' '.join(current))
+            limit = width
+            current = []
+            used = 0.0
+        if word_width <= limit:
+            current.append(word)
+            used = word_width
+            continue
+        # Overlong word: break it wherever the line is full
+        piece = ''
+        for char in word:
+            if piece and stringWidth(piece + char, font, size) > limit:
+                lines.append(piece)
+                limit = width
+                piece = ''
+            piece += char
+        current = [piece]
+        used = _text_width(piece, font, size)
+    if current:
+        lines.append(' '.join(current))
+    return lines
+
+
+class DirectPdfWriter:
+    """Lays out the portfolio sections straight onto a reportlab canvas.
+
+    Only the structures `build_full_html` produces are supported: a centred
+    header, section and project titles, paragraphs and bullet lists. There
+    is no HTML or CSS step, so rendering costs little more than the text
+    measurement.
+    """
+
+    def __init__(self, buffer, title=''):
+        self.canvas = canvas.Canvas(buffer, pagesize=letter)
+        self.canvas.setTitle(title)
+        self.y = PAGE_HEIGHT - MARGIN
+        self._style = None
+
+    def _ensure_space(self, height):
+        if self.y - height < MARGIN:
+            self.canvas.showPage()
+            self.y = PAGE_HEIGHT - MARGIN
+            # showPage resets the graphics state
+            self._style = None
+
+    def _set_style(self, style):
+        font, size, color = STYLES[style]
+        if style != self._style:
+            self.canvas.setFont(font, size)
+            self.canvas.setFillColor(color)
+            self._style = style
+        return font, size
+
+    def space(self, points):
+        self.y -= points
+
+    def rule(self, color, width, before=0, after=0):
+        self._ensure_space(before + width + after)
+        self.y -= before
+        self.canvas.setStrokeColor(color)
+        self.canvas.setLineWidth(width)
+        self.canvas.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        self.y -= width + after
+
+    def centered(self, text, style, after=0):
+        font, size = self._set_style(style)
+        for line in wrap_text(text, font, size, CONTENT_WIDTH):
+            self._ensure_space(size * LINE_HEIGHT)
+            self.y -= size * LINE_HEIGHT
+            self._set_style(style)
+            self.canvas.drawCentredString(PAGE_WIDTH / 2, self.y + size * 0.3, line)
+        self.y -= after
+
+    def paragraph(self, text, style='body', indent=0, label=None, bullet=False, after=5):
+        """Draws wrapped text; `label` is drawn in bold before the first line."""
+        font, size = STYLES[style][:2]
+        leading = size * LINE_HEIGHT
+        x = MARGIN + indent
+        width = CONTENT_WIDTH - indent
+        label_width = 0
+        if label:
+            label_width = stringWidth(label + ' ', 'Helvetica-Bold', size)
+        lines = wrap_text(text, font, size, width, width - label_width) or ['']
+
+        for i, line in enumerate(lines):
+            self._ensure_space(leading)
+            self.y -= leading
+            baseline = self.y + size * 0.3
+            line_x = x
+            if i == 0 and bullet:
+                self._set_style(style)
+                self.canvas.drawString(x - LIST_INDENT * 0.75, baseline, BULLET)
+            if i == 0 and label:
+                self._set_style('bold')
+                self.canvas.drawString(x, baseline, label)
+                line_x += label_width
+            self._set_style(style)
+            self.canvas.drawString(line_x, baseline, line)
+        self.y -= after
+
+    def section_title(self, text, before=15):
+        font, size = self._set_style('section')
+        # Keep the title together with at least one line of what follows
+        self._ensure_space(before + size * LINE_HEIGHT + 4 + 11 * LINE_HEIGHT)
+        self.y -= before
+        for line in wrap_text(text, font, size, CONTENT_WIDTH):
+            self.y -= size * LINE_HEIGHT
+            self._set_style('section')
+            self.canvas.drawString(MARGIN, self.y + size * 0.3, line)
+        self.rule(RULE_COLOR, 1, before=1, after=5)
+
+    def project_title(self, text):
+        self._ensure_space(10 + 12 * LINE_HEIGHT + 11 * LINE_HEIGHT)
+        self.space(10)
+        self.paragraph(text, 'project', after=0)
+
+    def image(self, image_bytes):
+        width, height = image_display_size(image_bytes)
+        self._ensure_space(height + 10)
+        self.y -= height + 5
+        self.canvas.drawImage(ImageReader(BytesIO(image_bytes)),
+                              MARGIN, self.y, width, height)
+        self.y -= 5
+
+    def link(self, url):
+        font, size = STYLES['link'][:2]
+        label = 'Link: '
+        lines = wrap_text(url, font, size, CONTENT_WIDTH,
+                          CONTENT_WIDTH - stringWidth(label, font, size))
+        clickable = is_safe_link(url)
+        for i, line in enumerate(lines):
+            self._ensure_space(size * LINE_HEIGHT)
+            self.y -= size * LINE_HEIGHT
+            baseline = self.y + size * 0.3
+            x = MARGIN
+            self._set_style('link')
+            if i == 0:
+                self.canvas.drawString(x, baseline, label)
+                x += stringWidth(label, font, size)
+            self.canvas.drawString(x, baseline, line)
+            if clickable:
+                self.canvas.linkURL(url, (x, self.y, x + stringWidth(line, font, size),
+                                          self.y + size * LINE_HEIGHT), relative=0)
+        self.y -= 5
+
+    def markdown(self, markdown_text):
+        """Draws AI markdown with the same rules as `write_markdown_html`."""
+        in_list = False
+        for line in markdown_text.split('\n'):
+            line = line.strip()
+            if not line:
+                if in_list:
+                    self.space(5)
+                    in_list = False
+                continue
+
+            if line[0] in '*-':
+                if not in_list:
+                    self.space(5)
+                    in_list = True
+                self.paragraph(line.lstrip('*- ').strip(), indent=LIST_INDENT,
+                               bullet=True, after=3.75)
+                continue
+
+            if in_list:
+                self.space(5)
+                in_list = False
+            if line.startswith('###'):
+                self.project_title(line.lstrip('# ').strip())
+            elif line[0] == '#':
+                self.section_title(line.lstrip('# ').strip())
+            else:
+                self.paragraph(line)
+
+    def save(self):
+        self.canvas.save()
+
+
+def render_direct_pdf(user_info, generated_content, structured_projects):
+    """Returns the portfolio PDF as bytes, laid out directly with reportlab.
+
+    Produces the same sections in the same order as `build_full_html`.
+    """
+    buffer = BytesIO()
+    writer = DirectPdfWriter(buffer, title=f"{user_info['name']} Portfolio")
+
+    # 1. Header
+    writer.centered(user_info['name'], 'name', after=5)
+    writer.centered(user_info['contact'], 'contact', after=15)
+    writer.rule(HexColor(BLUE), 2, before=10, after=10)
+
+    # 2. AI Generated Portfolio Summary
+    writer.section_title('AI-Generated Portfolio Summary', before=5)
+    if generated_content.get('portfolio'):
+        writer.markdown(generated_content['portfolio'])
+
+    # 3. Core Experience and Skills (Raw User Input)
+    writer.section_title('Core Skills & Experience Summary')
+    writer.paragraph(', '.join(user_info['skills']), label='Skills:')
+    writer.paragraph('', label='Experience:')
+    if user_info['experience']:
+        writer.space(5)
+        for exp in user_info['experience']:
+            writer.paragraph(exp, indent=LIST_INDENT, bullet=True, after=3.75)
+
+    # 4. Detailed Portfolio Projects (Structured Data)
+    if structured_projects:
+        writer.section_title('Detailed Projects')
+        for p in structured_projects:
+            if not p['title']:
+                continue
+            writer.project_title(p['title'])
+            if p.get('image'):
+                writer.image(p['image'])
+            if p['link']:
+                writer.link(p['link'])
+            if p['description']:
+                writer.paragraph(p['description'])
+
+    # 5. AI Generated Resume Summary (as an appendix)
+    if generated_content.get('resume'):
+        writer.section_title('AI-Generated Resume Highlights')
+        writer.markdown(generated_content['resume'])
+
+    writer.save()
+    return buffer.getvalue()
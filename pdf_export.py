@@ -0,0 +1,373 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from html import escape
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from metrics import timed_import
+
+logger = logging.getLogger(__name__)
+
+# Define constants for styling (used within the generated HTML/CSS)
+BLUE = '#007bff'
+DARK_BLUE = '#0056b3'
+TEAL = '#00cba9'
+GREY = '#646464'
+
+# Available renderers: "xhtml2pdf" converts styled HTML, "reportlab" lays the
+# known sections out directly (see pdf_direct) and skips HTML/CSS parsing
+PDF_BACKENDS = ('xhtml2pdf', 'reportlab')
+DEFAULT_PDF_BACKEND = os.getenv('PDF_BACKEND', 'xhtml2pdf').strip().lower()
+if DEFAULT_PDF_BACKEND not in PDF_BACKENDS:
+    # Report a typo once at startup instead of failing every render
+    logger.warning("Unknown PDF_BACKEND %r; choose one of %s. Using %r.",
+                   DEFAULT_PDF_BACKEND, ', '.join(PDF_BACKENDS), PDF_BACKENDS[0])
+    DEFAULT_PDF_BACKEND = PDF_BACKENDS[0]
+
+# URL schemes rendered as clickable links; other links (javascript:, file:,
+# ...) are printed as plain text
+LINK_SCHEMES = ('http', 'https', 'mailto')
+
+# Largest box (in points) a project image is drawn into
+PDF_IMAGE_MAX_WIDTH = 3.5 * 72
+PDF_IMAGE_MAX_HEIGHT = 3 * 72
+
+
+# --- CSS Styles (Embedded in HTML; built once at import) ---
+PDF_CSS = f"""
+    @page {{
+        size: letter;
+        margin: 0.75in;
+    }}
+    body {{ 
+        font-family: Helvetica, sans-serif; 
+        font-size: 11pt; 
+        color: #2c3e50; 
+        line-height: 1.4;
+    }}
+    h1 {{ 
+        color: {BLUE}; 
+        font-size: 18pt; 
+        text-align: center; 
+        margin-bottom: 5pt; 
+    }}
+    .contact {{ 
+        font-size: 10pt; 
+        color: {GREY}; 
+        text-align: center; 
+        margin-bottom: 15pt; 
+    }}
+    .separator {{ 
+        border-bottom: 2px solid {BLUE}; 
+        margin-top: 10pt; 
+        margin-bottom: 10pt; 
+    }}
+    .section-title {{
+        color: {DARK_BLUE};
+        font-size: 14pt;
+        font-weight: bold;
+        margin-top: 15pt;
+        margin-bottom: 5pt;
+        border-bottom: 1px solid #ddd;
+        padding-bottom: 3pt;
+    }}
+    .project-title {{
+        color: {TEAL};
+        font-size: 12pt;
+        font-weight: bold;
+        margin-top: 10pt;
+    }}
+    .project-link {{ font-style: italic; color: #0000ff; font-size: 10pt; }}
+    /* Important for Unicode bullet points and standard text */
+    ul {{ list-style-type: disc; margin-left: 15pt; margin-top: 5pt; padding-left: 0; }}
+    ul li {{ margin-bottom: 5px; }}
+    p {{ margin-top: 0; margin-bottom: 5pt; }}
+    """
+
+
+class PdfRenderError(Exception):
+    """Raised when xhtml2pdf reports an error while converting the HTML."""
+
+
+def is_safe_link(url):
+    """Returns True if `url` may become a clickable link in the PDF (see LINK_SCHEMES)."""
+    try:
+        return urlsplit(url.strip()).scheme.lower() in LINK_SCHEMES
+    except ValueError:
+        return False
+
+
+def image_display_size(image_bytes):
+    """Returns the `(width, height)` in points at which a project image is drawn.
+
+    Images are scaled down (never up) to fit PDF_IMAGE_MAX_WIDTH x
+    PDF_IMAGE_MAX_HEIGHT, one pixel per point, keeping the aspect ratio.
+    """
+    Image = timed_import('PIL.Image')
+    with Image.open(BytesIO(image_bytes)) as img:
+        width, height = img.size
+    scale = min(1.0, PDF_IMAGE_MAX_WIDTH / width, PDF_IMAGE_MAX_HEIGHT / height)
+    return width * scale, height * scale
+
+
+def write_markdown_html(markdown_text, write):
+    """Writes AI markdown content (which uses *, -, and # for headings/lists) as HTML.
+
+    Fragments are passed to `write` (e.g. `list.append`), so the document is
+    never copied while it is being assembled. The text is HTML-escaped in a
+    single pass up front; escaping does not touch the *, - and # markers.
+    """
+    in_list = False
+    sep = ''
+
+    for line in escape(markdown_text, quote=False).split('\n'):
+        line = line.strip()
+        if not line:
+            if in_list:
+                write('\n</ul>')
+                in_list = False
+            continue
+
+        if line[0] in '*-':
+            item_text = line.lstrip('*- ').strip()
+            if in_list:
+                write(f'\n<li>{item_text}</li>')
+            else:
+                write(f'{sep}<ul>\n<li>{item_text}</li>')
+                in_list = True
+        else:
+            if in_list:
+                write('\n</ul>')
+                in_list = False
+            if line.startswith('###'):
+                write(
+                    f'{sep}<div class="project-title">{line.lstrip("# ").strip()}</div>')
+            elif line[0] == '#':
+                # Use standard section title style defined in CSS
+                write(
+                    f'{sep}<div class="section-title">{line.lstrip("# ").strip()}</div>')
+            else:
+                write(f'{sep}<p>{line}</p>')
+        sep = '\n'
+
+    if in_list:
+        write('\n</ul>')
+
+
+def markdown_to_html(markdown_text):
+    """Converts AI markdown content (which uses *, -, and # for headings/lists) to HTML."""
+    parts = []
+    write_markdown_html(markdown_text, parts.append)
+    return ''.join(parts)
+
+
+def build_full_html(user_info, generated_content, structured_projects, timings=None):
+    """Builds the styled HTML document that is converted to the portfolio PDF.
+
+    Every fragment is appended once to a single list that is joined at the
+    end, so assembly stays linear in the document size with no intermediate
+    copies of the growing document. User and
+    AI text is HTML-escaped. If a `timings` dict is given, the time spent converting
+    markdown is added to its "markdown_to_html" entry.
+    """
+    parts = []
+    write = parts.append
+
+    # Helper to convert AI markdown content to HTML, timing each call
+    def write_markdown(markdown_text):
+        started = time.perf_counter()
+        write_markdown_html(markdown_text, write)
+        if timings is not None:
+            timings["markdown_to_html"] = timings.get(
+                "markdown_to_html", 0.0) + time.perf_counter() - started
+
+    name = escape(user_info['name'], quote=False)
+
+    # 1. Document head and header
+    write('<!DOCTYPE html>\n<html>\n<head>\n')
+    write(f'<title>{name} Portfolio</title>\n')
+    # Explicitly declare UTF-8 charset for robust Unicode handling
+    write('<meta charset="UTF-8"/>\n')
+    write(f'<style>{PDF_CSS}</style>\n</head>\n<body>\n')
+    write(f'<h1>{name}</h1>\n')
+    write(f'<p class="contact">{escape(user_info["contact"], quote=False)}</p>\n')
+    write('<div class="separator"></div>\n')
+
+    # 2. AI Generated Portfolio Summary (HTML from markdown)
+    write('<div class="section-title" style="margin-top: 5pt;">AI-Generated Portfolio Summary</div>')
+    if generated_content.get('portfolio'):
+        write_markdown(generated_content['portfolio'])
+
+    # 3. Core Experience and Skills (Raw User Input)
+    write('<div class="section-title">Core Skills &amp; Experience Summary</div>')
+    write(
+        f'<p><b>Skills:</b> {escape(", ".join(user_info["skills"]), quote=False)}</p>')
+    write('<p><b>Experience:</b></p>')
+    if user_info['experience']:
+        write('<ul class="experience-list">')
+        for exp in user_info['experience']:
+            write(f'<li>{escape(exp, quote=False)}</li>')
+        write('</ul>')
+
+    # 4. Detailed Portfolio Projects (Structured Data)
+    if structured_projects:
+        write('<div class="section-title">Detailed Projects</div>')
+        for p in structured_projects:
+            if not p['title']:
+                continue
+            write(f'<div class="project-title">{escape(p["title"], quote=False)}</div>')
+            if p.get('image'):
+                width, height = image_display_size(p['image'])
+                write('<p><img src="data:image/jpeg;base64,')
+                write(base64.b64encode(p['image']).decode('ascii'))
+                write(f'" width="{width:.0f}pt" height="{height:.0f}pt"/></p>')
+            if p['link']:
+                link = escape(p['link'])
+                if is_safe_link(p['link']):
+                    write(
+                        f'<p class="project-link">Link: <a href="{link}">{link}</a></p>')
+                else:
+                    write(f'<p class="project-link">Link: {link}</p>')
+            if p['description']:
+                write(f'<p>{escape(p["description"], quote=False)}</p>')
+
+    # 5. AI Generated Resume Summary (as an appendix)
+    if generated_content.get('resume'):
+        write('<div class="section-title">AI-Generated Resume Highlights</div>')
+        write_markdown(generated_content['resume'])
+
+    write('\n</body>\n</html>\n')
+    return ''.join(parts)
+
+
+def _render_with_xhtml2pdf(user_info, generated_content, structured_projects, timings):
+    pisa = timed_import('xhtml2pdf.pisa')
+
+    started = time.perf_counter()
+    full_html = build_full_html(
+        user_info, generated_content, structured_projects, timings)
+    timings["html_build"] = time.perf_counter() - started
+
+    # Convert HTML to PDF using pisa
+    buffer = BytesIO()
+    started = time.perf_counter()
+    pisa_status = pisa.CreatePDF(
+        full_html,
+        dest=buffer
+    )
+    timings["pisa"] = time.perf_counter() - started
+    if pisa_status.err:
+        raise PdfRenderError(
+            "Error creating PDF using xhtml2pdf. Check the HTML content or library installation.")
+    return buffer.getvalue()
+
+
+def _render_with_reportlab(user_info, generated_content, structured_projects, timings):
+    pdf_direct = timed_import('pdf_direct')
+
+    started = time.perf_counter()
+    pdf_bytes = pdf_direct.render_direct_pdf(
+        user_info, generated_content, structured_projects)
+    timings["reportlab"] = time.perf_counter() - started
+    return pdf_bytes
+
+
+_RENDERERS = {
+    'xhtml2pdf': _render_with_xhtml2pdf,
+    'reportlab': _render_with_reportlab,
+}
+
+
+def render_full_pdf(user_info, generated_content, structured_projects, timings=None, backend=None):
+    """
+    Generates the comprehensive portfolio PDF with the chosen backend (see PDF_BACKENDS).
+    Returns the PDF as bytes and raises PdfRenderError if pisa reports an error.
+
+    This function has no Streamlit dependency, so it can run in a worker process.
+    If a `timings` dict is given, it is filled with the seconds spent per stage:
+    "html_build" (which includes "markdown_to_html") and "pisa" for xhtml2pdf,
+    "reportlab" for the direct backend.
+    """
+    backend = backend or DEFAULT_PDF_BACKEND
+    if backend not in _RENDERERS:
+        raise ValueError(
+            f"Unknown PDF backend {backend!r}; choose one of {', '.join(PDF_BACKENDS)}.")
+    timings = {} if timings is None else timings
+    return _RENDERERS[backend](user_info, generated_content, structured_projects, timings)
+
+
+def render_full_pdf_with_timings(user_info, generated_content, structured_projects, backend=None):
+    """Like `render_full_pdf`, but returns `(pdf_bytes, timings)`.
+
+    Used by worker processes, whose metrics would otherwise be lost.
+    """
+    timings = {}
+    pdf_bytes = render_full_pdf(
+        user_info, generated_content, structured_projects, timings, backend)
+    return pdf_bytes, timings
+
+
+class BytesLRUCache:
+    """Bounded in-memory LRU of bytes values, keyed on a content hash.
+
+    Both the number of entries and their total size are capped; the least
+    recently used values are dropped first.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._total_bytes += len(data)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._total_bytes}
+
+
+class PdfRenderCache(BytesLRUCache):
+    """Rendered PDF bytes, keyed on `pdf_content_key`."""
+
+
+def pdf_content_key(profile_fingerprint, generated_content, backend=None):
+    """Returns a content hash of everything that affects the rendered PDF.
+
+    `profile_fingerprint` (`CandidateProfile.pdf_fingerprint`) stands in for
+    the user info and projects, including image content hashes, so the key
+    is computed without loading or hashing the embedded images.
+    """
+    payload = json.dumps(
+        [backend or DEFAULT_PDF_BACKEND, profile_fingerprint, generated_content], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
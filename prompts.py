@@ -0,0 +1,96 @@
+import hashlib
+import json
+
+DOCUMENT_NAMES = ('resume', 'cover_letter', 'portfolio')
+
+# Prompt inputs each document depends on (only the resume uses the template)
+DOCUMENT_INPUTS = {
+    'resume': ('skills', 'projects', 'experience', 'resume_template', 'tone'),
+    'cover_letter': ('skills', 'projects', 'experience', 'tone'),
+    'portfolio': ('skills', 'projects', 'experience', 'tone'),
+}
+
+
+def split_skills(skills_text):
+    """Splits the comma-separated skills text into a list of stripped skills."""
+    return [skill.strip() for skill in skills_text.split(',') if skill.strip()]
+
+
+def split_lines(text):
+    """Splits newline-separated text (projects, experience) into stripped entries."""
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+def projects_for_ai(project_names, structured_projects):
+    """Combines the brief project list with structured project details for AI context."""
+    return project_names + \
+        [f"{p['title']}: {p['description']}" for p in structured_projects if p["title"] or p["description"]]
+
+
+def build_prompts(skills, projects, experience, resume_template, tone):
+    """Builds the resume, cover letter and portfolio prompts.
+
+    `skills`, `projects` and `experience` are lists of already-processed
+    entries. Returns a dict keyed by document name.
+    """
+    resume_prompt = f"""Generate a professional resume summary and 3-5 key bullet points for the experience section based on:
+Skills: {', '.join(skills)}
+Projects: {'; '.join(projects)}
+Experience: {'; '.join(experience)}
+Template: {resume_template}. Tone: {tone}.
+Format the output using markdown headings and bullet points.
+"""
+    cover_letter_prompt = f"""Write a compelling cover letter introduction and 3 core paragraphs (targeting an unspecified but relevant job) based on:
+Skills: {', '.join(skills)}. Projects: {'; '.join(projects)}. Experience: {'; '.join(experience)}.
+Desired Tone: {tone}. Start with a placeholder greeting (e.g., Dear Hiring Manager,).
+Format the output using markdown paragraphs.
+"""
+    portfolio_prompt = f"""Create a concise portfolio summary (about 100 words) and a list of 3 featured project highlights based on:
+Skills: {', '.join(skills)}. Experience: {'; '.join(experience)}. Projects: {'; '.join(projects)}.
+Desired Tone: {tone}.
+Format the output using markdown headings and lists.
+"""
+    return {
+        'resume': resume_prompt,
+        'cover_letter': cover_letter_prompt,
+        'portfolio': portfolio_prompt,
+    }
+
+
+def build_combined_prompt(skills, projects, experience, resume_template, tone):
+    """Builds one prompt that asks for all three documents as a JSON object.
+
+    The shared candidate data is sent once instead of once per document.
+    """
+    return f"""Using the candidate data below, write three documents and return them as a JSON object with exactly the keys "resume", "cover_letter" and "portfolio". Each value must be a single markdown string.
+Candidate data:
+Skills: {', '.join(skills)}
+Projects: {'; '.join(projects)}
+Experience: {'; '.join(experience)}
+Documents:
+- "resume": a professional resume summary and 3-5 key bullet points for the experience section. Template: {resume_template}. Tone: {tone}. Use markdown headings and bullet points.
+- "cover_letter": a compelling cover letter introduction and 3 core paragraphs (targeting an unspecified but relevant job). Desired Tone: {tone}. Start with a placeholder greeting (e.g., Dear Hiring Manager,). Use markdown paragraphs.
+- "portfolio": a concise portfolio summary (about 100 words) and a list of 3 featured project highlights. Desired Tone: {tone}. Use markdown headings and lists.
+"""
+
+
+def content_fingerprint(value):
+    """Returns a stable hash of a JSON-serialisable value."""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def document_fingerprints(input_fingerprints, max_tokens, settings=None):
+    """Returns `{name: fingerprint}` of everything each document's prompt uses.
+
+    `input_fingerprints` maps the names in DOCUMENT_INPUTS to hashes of
+    their processed values (see `CandidateProfile.input_fingerprints`) and
+    `max_tokens` maps document names to their limits. `settings` (e.g. the
+    model, or mock mode) applies to every document. A document only needs
+    regenerating when its fingerprint changes.
+    """
+    return {
+        name: content_fingerprint([[key, input_fingerprints[key]] for key in used] +
+                                  [max_tokens[name], settings])
+        for name, used in DOCUMENT_INPUTS.items()
+    }
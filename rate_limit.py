@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from concurrent.futures import CancelledError
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` units a minute."""
+
+    def __init__(self, per_minute):
+        if not per_minute > 0:
+            raise ValueError(f"Rate limit must be positive, got {per_minute!r}.")
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens +
+                           (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, cancel_event=None):
+        """Blocks until `amount` units are available, takes them and returns the seconds waited.
+
+        Requests larger than the bucket are clamped to its capacity so they
+        can still be served. Setting `cancel_event` ends the wait with
+        CancelledError (nothing is taken then).
+        """
+        amount = min(float(amount), self.capacity)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return time.monotonic() - started
+                delay = (amount - self._tokens) / self.rate
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise CancelledError()
+
+
+def is_retryable(exc):
+    """Returns True for rate-limit, timeout, connection and 5xx errors."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after_seconds(exc):
+    """Returns the delay requested by the server's Retry-After headers, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date values are rare for this API; use regular backoff instead
+        return None
+    return None
+
+
+class RequestScheduler:
+    """Process-wide admission control and retry policy for completion calls.
+
+    Every call first takes one unit from the requests-per-minute bucket and
+    its estimated token count from the tokens-per-minute bucket, so bursts
+    queue instead of hitting the provider's limits. Retryable failures are
+    retried with exponential backoff and full jitter (capped at
+    `max_delay`). A server's Retry-After is honoured in full; if it asks
+    for more than `max_retry_after` seconds, the error is raised at once
+    instead.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=5, base_delay=1.0, max_delay=30.0,
+                 max_retry_after=120.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0,
+                       "failures": 0, "queued_seconds": 0.0}
+
+    def backoff_delay(self, attempt, exc=None):
+        """Returns the sleep before retry number `attempt` (starting at 1).
+
+        A delay requested with Retry-After is returned as is, even above
+        `max_delay`.
+        """
+        requested = retry_after_seconds(exc) if exc is not None else None
+        if requested is not None:
+            return requested
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def run(self, call, estimated_tokens=0, on_retry=None, cancel_event=None):
+        """Runs `call()` under the rate limits, retrying retryable errors.
+
+        `on_retry(attempt, exc, delay)` is called before each retry. Returns
+        the call's result; the last error is raised once retries are
+        exhausted, for errors that are not retryable and when the server
+        asks to wait longer than `max_retry_after`. Setting `cancel_event`
+        ends a rate-limit or backoff wait early with CancelledError.
+        """
+        attempt = 0
+        while True:
+            queued = self.requests.acquire(1, cancel_event)
+            queued += self.tokens.acquire(estimated_tokens, cancel_event)
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["queued_seconds"] += queued
+            try:
+                return call()
+            except Exception as e:
+                attempt += 1
+                delay = self.backoff_delay(attempt, e)
+                if attempt > self.max_retries or not is_retryable(e) or delay > self.max_retry_after:
+                    with self._lock:
+                        self._stats["failures"] += 1
+                    raise
+                with self._lock:
+                    self._stats["retries"] += 1
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                if cancel_event is None:
+                    time.sleep(delay)
+                elif cancel_event.wait(delay):
+                    raise CancelledError() from e
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
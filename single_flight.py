@@ -0,0 +1,223 @@
+import threading
+import time
+from concurrent.futures import CancelledError, Future, wait
+
+from metrics import METRICS
+
+# How often a waiting caller checks its cancel event
+CANCEL_POLL_SECONDS = 0.1
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running (followers) wait for the same result. Errors
+    are raised in every waiter. Exceptions listed in `private_errors`
+    belong to the leader alone (e.g. its own request was cancelled), so
+    followers start a new flight instead of inheriting them.
+    """
+
+    def __init__(self, name, private_errors=(CancelledError,)):
+        self.name = name
+        self.private_errors = private_errors
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func, timeout=None, cancel_event=None):
+        """Returns `(result, shared)`; `shared` is True if another caller did the work.
+
+        A follower that gives up after `timeout` seconds gets a
+        TimeoutError, and one whose `cancel_event` is set gets a
+        CancelledError; the leader and the other followers are unaffected.
+        """
+        while True:
+            with self._lock:
+                future = self._flights.get(key)
+                leader = future is None
+                if leader:
+                    future = self._flights[key] = Future()
+
+            if leader:
+                return self._lead(key, future, func), False
+
+            METRICS.increment("single_flight_waits_total", flight=self.name)
+            self._wait(future, timeout, cancel_event)
+            try:
+                return future.result(0), True
+            except self.private_errors:
+                # The leader was cancelled; try again (possibly as the new leader)
+                continue
+
+    @staticmethod
+    def _wait(future, timeout, cancel_event):
+        """Waits until `future` is resolved, `timeout` passed or `cancel_event` is set."""
+        if cancel_event is None:
+            wait([future], timeout)
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not future.done():
+            if cancel_event.is_set():
+                raise CancelledError()
+            remaining = CANCEL_POLL_SECONDS if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            wait([future], min(remaining, CANCEL_POLL_SECONDS))
+
+    def _lead(self, key, future, func):
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key):
+        # Unregister before resolving so later callers start a fresh flight
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+class _StreamFlight:
+    __slots__ = ("chunks", "done", "error", "readers", "cond", "abandoned")
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.readers = 0
+        self.cond = threading.Condition()
+        self.abandoned = threading.Event()  # set once the last reader left before the end
+
+
+class _StreamReader:
+    """One caller's iterator over a flight; closing it detaches the reader, even before the first chunk."""
+    __slots__ = ("_chunks", "_detach", "_detached")
+
+    def __init__(self, chunks, detach):
+        self._chunks = chunks
+        self._detach = detach
+        self._detached = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._detached:
+            self._detached = True
+            self._chunks.close()
+            self._detach()
+
+
+class StreamFlights:
+    """Coalesces concurrent identical streams into one upstream stream.
+
+    A pump thread consumes the upstream iterator and every caller (the
+    first one included) reads the chunks from a shared buffer, so a caller
+    that joins late still gets the whole text. Any reader may stop early
+    (by closing its iterator) without affecting the others. Once no reader
+    is left, the flight is abandoned: new callers start a fresh one, and
+    the pump closes the upstream stream at its next chunk. Errors are
+    raised in every reader.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def stream(self, key, open_stream, on_abandon=None, cancel_event=None):
+        """Returns an iterator over the chunks of `open_stream(abandoned)`, shared by key.
+
+        `abandoned` is an Event set when every reader has left, so the
+        opener can stop waiting (e.g. between retries). `on_abandon(chunks)`
+        is called with everything received from upstream once an abandoned
+        stream has been closed; it is not called for streams that finished.
+        Setting `cancel_event` makes this reader raise CancelledError and
+        leave within CANCEL_POLL_SECONDS, even before the first chunk.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            shared = flight is not None
+            if not shared:
+                flight = self._flights[key] = _StreamFlight()
+                threading.Thread(target=self._pump, args=(key, flight, open_stream, on_abandon),
+                                 name=f"{self.name}-stream", daemon=True).start()
+            with flight.cond:
+                flight.readers += 1
+        if shared:
+            METRICS.increment("single_flight_waits_total", flight=self.name)
+        return _StreamReader(self._read(flight, cancel_event), lambda: self._detach(key, flight))
+
+    def _detach(self, key, flight):
+        # Holding the registry lock means nobody can join a flight we abandon
+        with self._lock, flight.cond:
+            flight.readers -= 1
+            if flight.readers == 0 and not flight.done:
+                flight.abandoned.set()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _pump(self, key, flight, open_stream, on_abandon):
+        error = None
+        iterator = None
+        received = None
+        try:
+            iterator = open_stream(flight.abandoned)
+            for chunk in iterator:
+                with flight.cond:
+                    if flight.abandoned.is_set():
+                        received = flight.chunks + [chunk]
+                        error = CancelledError()
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            error = e
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.error = error
+                flight.cond.notify_all()
+        if received is not None and on_abandon is not None:
+            on_abandon(received)
+
+    def _read(self, flight, cancel_event):
+        position = 0
+        while True:
+            with flight.cond:
+                while position >= len(flight.chunks) and not flight.done:
+                    if cancel_event is None:
+                        flight.cond.wait()
+                    elif cancel_event.is_set():
+                        raise CancelledError()
+                    else:
+                        flight.cond.wait(CANCEL_POLL_SECONDS)
+                chunks = flight.chunks[position:]
+                position += len(chunks)
+                finished = flight.done and position == len(flight.chunks)
+                error = flight.error
+            yield from chunks
+            if finished:
+                if error is not None:
+                    raise error
+                return
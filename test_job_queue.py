@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import Counter
+
+from job_queue import DONE, QUEUED, RUNNING, JobQueue
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_jobs_shared_by_several_queues_run_once(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    runs = Counter()
+    lock = threading.Lock()
+
+    def handler(payload, report_progress, cancel_event):
+        with lock:
+            runs[payload['n']] += 1
+        return payload['n']
+
+    queues = [JobQueue(path, handler, workers=4, max_running_per_owner=4, poll_seconds=0.01)
+              for _ in range(4)]
+    job_ids = [queues[0].enqueue(f'owner-{n % 8}', {'n': n}) for n in range(200)]
+    for queue in queues:
+        queue.start()
+
+    wait_for(lambda: queues[0].stats().get(DONE, 0) == len(job_ids))
+    assert [n for n, count in runs.items() if count > 1] == []
+    assert len(runs) == len(job_ids)
+    assert all(queues[0].get(job_id)['attempts'] == 1 for job_id in job_ids)
+
+
+def test_expired_lease_is_requeued_and_run_by_another_queue(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    # A queue that claims the job but never renews its lease, like a dead process
+    dead = JobQueue(path, handler=None, lease_seconds=0.2)
+    job_id = dead.enqueue('owner', {'n': 1})
+    assert dead._claim()[0] == job_id
+    assert dead.get(job_id)['status'] == RUNNING
+
+    alive = JobQueue(path, lambda payload, report_progress, cancel_event: 'ok',
+                     poll_seconds=0.01, lease_seconds=0.2, maintenance_interval_seconds=0.05)
+    alive.start()
+    wait_for(lambda: alive.get(job_id)['status'] == DONE)
+    job = alive.get(job_id)
+    assert job['result'] == 'ok'
+    assert job['attempts'] == 2
+    # The dead process's late result is discarded
+    assert not dead._update_running(job_id, status=DONE)
+
+
+def test_live_lease_is_not_taken_over(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    release = threading.Event()
+    owner = JobQueue(path, lambda payload, report_progress, cancel_event: release.wait(5),
+                     poll_seconds=0.01, lease_seconds=0.3)
+    job_id = owner.enqueue('owner', {})
+    owner.start()
+    wait_for(lambda: owner.get(job_id)['status'] == RUNNING)
+
+    other = JobQueue(path, handler=None, lease_seconds=0.3)
+    time.sleep(0.6)  # longer than the lease; the owner keeps renewing it
+    other._requeue_expired()
+    assert other.get(job_id)['status'] == RUNNING
+    release.set()
+    wait_for(lambda: owner.get(job_id)['status'] == DONE)
+
+
+def test_cancel_signals_running_job(tmp_path):
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def handler(payload, report_progress, cancel_event):
+        started.set()
+        if cancel_event.wait(5):
+            stopped.set()
+        return 'late'
+
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), handler, poll_seconds=0.01)
+    queue.start()
+    job_id = queue.enqueue('owner', {})
+    assert started.wait(5)
+    assert queue.cancel(job_id)
+    assert stopped.wait(5)
+    wait_for(lambda: queue._cancel_events == {})
+    assert queue.get(job_id)['status'] == 'cancelled'
+    assert queue.get(job_id)['result'] is None
+    assert not queue.cancel(job_id)
+
+
+def test_cancel_of_queued_job_keeps_it_from_running(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), handler=None)
+    job_id = queue.enqueue('owner', {})
+    assert queue.get(job_id)['status'] == QUEUED
+    assert queue.cancel(job_id)
+    assert queue._claim() is None
@@ -0,0 +1,12 @@
+from metrics import MetricsRegistry
+
+
+def test_prometheus_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.increment('llm_errors_total', error='Bad "quote" \\ and\nnewline')
+    registry.observe('llm_request_seconds', 0.5, model='a"b')
+    text = registry.to_prometheus()
+    assert 'llm_errors_total{error="Bad \\"quote\\" \\\\ and\\nnewline"} 1' in text
+    assert 'llm_request_seconds_count{model="a\\"b"} 1' in text
+    # Every sample stays on its own line
+    assert all(line.startswith(('#', 'llm_')) for line in text.splitlines())
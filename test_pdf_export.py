@@ -0,0 +1,48 @@
+import pytest
+
+from bench_pdf import check_pdf, expected_pdf_text, pdf_page_count, pdf_text_lines, synthetic_profile
+from pdf_export import PDF_BACKENDS, render_full_pdf
+
+# Module each backend needs; a backend whose library is missing is skipped
+BACKEND_MODULES = {'xhtml2pdf': 'xhtml2pdf', 'reportlab': 'reportlab'}
+# Profiles both backends lay out on the same number of pages
+SIZES = ('tiny', 'small')
+
+
+def render(size, backend):
+    pytest.importorskip(BACKEND_MODULES[backend])
+    user_info, generated_content, structured_projects = synthetic_profile(size)
+    return render_full_pdf(user_info, generated_content, structured_projects, backend=backend)
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('backend', PDF_BACKENDS)
+def test_backend_output_passes_checks(backend, size):
+    pdf_bytes = render(size, backend)
+    user_info, generated_content, structured_projects = synthetic_profile(size)
+    assert check_pdf(pdf_bytes, user_info, generated_content, structured_projects) == []
+
+    lines = pdf_text_lines(pdf_bytes)
+    assert lines[0] == user_info['name']
+    for title in expected_pdf_text(user_info, generated_content, structured_projects):
+        assert title in lines
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_backends_agree(size):
+    outputs = {backend: render(size, backend) for backend in PDF_BACKENDS}
+    user_info, generated_content, structured_projects = synthetic_profile(size)
+    expected = expected_pdf_text(user_info, generated_content, structured_projects)
+
+    page_counts = {backend: pdf_page_count(pdf) for backend, pdf in outputs.items()}
+    assert len(set(page_counts.values())) == 1, page_counts
+    titles = {backend: [line for line in pdf_text_lines(pdf) if line in expected]
+              for backend, pdf in outputs.items()}
+    assert all(found == expected for found in titles.values()), titles
+
+
+def test_check_pdf_rejects_output_without_text():
+    user_info, generated_content, structured_projects = synthetic_profile('tiny')
+    problems = check_pdf(b'%PDF-1.4 /FlateDecode /Type /Page %%EOF',
+                         user_info, generated_content, structured_projects)
+    assert any('Jane Benchmark' in problem for problem in problems)
@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from rate_limit import RequestScheduler, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__('rate limited')
+        self.response = FakeResponse(headers or {})
+
+
+def failing_call(errors, result='ok'):
+    """Returns a call that raises `errors` one by one, then returns `result`."""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def scheduler(**kwargs):
+    return RequestScheduler(6000, 600000, base_delay=0.01, max_delay=0.01, **kwargs)
+
+
+@pytest.mark.parametrize('per_minute', [0, -1])
+def test_bucket_rejects_non_positive_limits(per_minute):
+    with pytest.raises(ValueError):
+        TokenBucket(per_minute)
+
+
+def test_bucket_waits_for_capacity():
+    bucket = TokenBucket(600)  # 10 units a second
+    assert bucket.acquire(600) < 0.05
+    assert bucket.acquire(1) >= 0.05
+
+
+def test_cancelled_bucket_wait_raises_and_takes_nothing():
+    bucket = TokenBucket(60)  # 1 unit a second
+    bucket.acquire(60)
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    started = time.monotonic()
+    with pytest.raises(CancelledError):
+        bucket.acquire(30, cancel_event)
+    assert time.monotonic() - started < 1
+    assert bucket._tokens < 1
+
+
+def test_retry_after_is_honoured_in_full():
+    retries = []
+    result = scheduler(max_retry_after=1).run(
+        failing_call([RateLimitError({'retry-after-ms': '200'})]),
+        on_retry=lambda attempt, exc, delay: retries.append(delay))
+    assert result == 'ok'
+    assert retries == [0.2]
+
+
+def test_long_retry_after_fails_at_once():
+    error = RateLimitError({'retry-after': '600'})
+    started = time.monotonic()
+    with pytest.raises(RateLimitError):
+        scheduler(max_retry_after=120).run(failing_call([error]))
+    assert time.monotonic() - started < 1
+
+
+def test_cancel_ends_retry_after_wait():
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    started = time.monotonic()
+    with pytest.raises(CancelledError):
+        scheduler().run(failing_call([RateLimitError({'retry-after': '30'})]),
+                        cancel_event=cancel_event)
+    assert time.monotonic() - started < 1
+
+
+def test_non_retryable_errors_are_raised():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        scheduler().run(call)
+    assert len(calls) == 1
+
+
+def test_retries_give_up_after_max_retries():
+    errors = [RateLimitError() for _ in range(3)]
+    with pytest.raises(RateLimitError):
+        scheduler(max_retries=2).run(failing_call(errors))
+    assert scheduler(max_retries=3).run(failing_call(errors)) == 'ok'
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight, StreamFlights
+
+
+def test_followers_share_the_leaders_result():
+    flights = SingleFlight('test')
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(flights.do, 'key', func) for _ in range(4)]
+        while flights.in_flight() == 0:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        results = [future.result(5) for future in futures]
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(result == 'result' for result, _ in results)
+
+
+def test_cancelled_follower_stops_waiting():
+    flights = SingleFlight('test')
+    release = threading.Event()
+    cancel_event = threading.Event()
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(flights.do, 'key', lambda: release.wait(5) and 'result')
+        while flights.in_flight() == 0:
+            time.sleep(0.01)
+        follower = executor.submit(flights.do, 'key', lambda: 'unused', cancel_event=cancel_event)
+        time.sleep(0.05)
+        cancel_event.set()
+        with pytest.raises(CancelledError):
+            follower.result(1)
+        assert not leader.done()
+        release.set()
+        assert leader.result(5) == ('result', False)
+
+
+def test_follower_times_out():
+    flights = SingleFlight('test')
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as executor:
+        leader = executor.submit(flights.do, 'key', lambda: release.wait(5) and 'result')
+        while flights.in_flight() == 0:
+            time.sleep(0.01)
+        with pytest.raises(TimeoutError):
+            flights.do('key', lambda: 'unused', timeout=0.05, cancel_event=threading.Event())
+        release.set()
+        leader.result(5)
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    flights = SingleFlight('test')
+    leader_started = threading.Event()
+    cancel_leader = threading.Event()
+
+    def leader_func():
+        leader_started.set()
+        cancel_leader.wait(5)
+        raise CancelledError()
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(flights.do, 'key', leader_func)
+        assert leader_started.wait(5)
+        follower = executor.submit(flights.do, 'key', lambda: 'own result')
+        time.sleep(0.05)
+        cancel_leader.set()
+        with pytest.raises(CancelledError):
+            leader.result(5)
+        assert follower.result(5) == ('own result', False)
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight('test')
+    release = threading.Event()
+
+    def func():
+        release.wait(5)
+        raise ValueError('boom')
+
+    with ThreadPoolExecutor(3) as executor:
+        futures = [executor.submit(flights.do, 'key', func) for _ in range(3)]
+        while flights.in_flight() == 0:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(5)
+    assert flights.in_flight() == 0
+
+
+def test_late_stream_reader_gets_every_chunk():
+    flights = StreamFlights('test')
+    chunks = queue.Queue()
+    opened = []
+
+    def open_stream(abandoned):
+        opened.append(1)
+        while (chunk := chunks.get(timeout=5)) is not None:
+            yield chunk
+
+    first = flights.stream('key', open_stream)
+    chunks.put('a')
+    assert next(first) == 'a'
+    second = flights.stream('key', open_stream)
+    chunks.put('b')
+    chunks.put(None)
+    assert list(first) == ['b']
+    assert list(second) == ['a', 'b']
+    assert len(opened) == 1
+
+
+def test_cancelled_stream_reader_leaves_before_the_first_chunk():
+    flights = StreamFlights('test')
+    abandoned_seen = threading.Event()
+    abandoned_chunks = []
+
+    def open_stream(abandoned):
+        # Like a request waiting out a long Retry-After
+        if abandoned.wait(5):
+            abandoned_seen.set()
+            raise CancelledError()
+        yield 'too late'
+
+    cancel_event = threading.Event()
+    reader = flights.stream('key', open_stream, on_abandon=abandoned_chunks.append,
+                            cancel_event=cancel_event)
+    with ThreadPoolExecutor(1) as executor:
+        result = executor.submit(list, reader)
+        time.sleep(0.05)
+        started = time.monotonic()
+        cancel_event.set()
+        with pytest.raises(CancelledError):
+            result.result(1)
+    assert time.monotonic() - started < 1
+    assert abandoned_seen.wait(1)
+    # Nothing was received, so there are no streamed tokens to report
+    assert abandoned_chunks == []
+
+
+def test_stream_is_closed_only_when_its_last_reader_leaves():
+    flights = StreamFlights('test')
+    chunks = queue.Queue()
+    closed = threading.Event()
+    abandoned_chunks = []
+
+    def open_stream(abandoned):
+        try:
+            while (chunk := chunks.get(timeout=5)) is not None:
+                yield chunk
+        finally:
+            closed.set()
+
+    first = flights.stream('key', open_stream, on_abandon=abandoned_chunks.append)
+    second = flights.stream('key', open_stream, on_abandon=abandoned_chunks.append)
+    chunks.put('a')
+    assert next(first) == 'a'
+    first.close()
+    chunks.put('b')
+    assert next(second) == 'a'
+    assert next(second) == 'b'
+    assert not closed.is_set()
+    second.close()
+    # The pump notices at its next chunk and closes the upstream stream
+    chunks.put('c')
+    assert closed.wait(5)
+    deadline = time.monotonic() + 5
+    while not abandoned_chunks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert abandoned_chunks == [['a', 'b', 'c']]
+    # A new caller starts a fresh flight
+    chunks.put(None)
+    assert list(flights.stream('key', open_stream)) == []
+
+
+def test_stream_errors_reach_every_reader():
+    flights = StreamFlights('test')
+    release = threading.Event()
+
+    def open_stream(abandoned):
+        release.wait(5)
+        yield 'a'
+        raise ValueError('boom')
+
+    readers = [flights.stream('key', open_stream) for _ in range(2)]
+    release.set()
+    for reader in readers:
+        assert next(reader) == 'a'
+        with pytest.raises(ValueError):
+            next(reader)
@@ -0,0 +1,115 @@
+import logging
+import math
+import os
+from functools import lru_cache
+
+from metrics import timed_import
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the tokens spent on project details in each prompt
+PROMPT_PROJECT_TOKEN_BUDGET = int(
+    os.getenv("PROMPT_PROJECT_TOKEN_BUDGET", "1200"))
+# No single project entry may use more than this share of the budget
+MAX_PROJECT_SHARE = 0.5
+
+# Completion sizes that comfortably fit what each prompt asks for
+DOCUMENT_MAX_TOKENS = {
+    'resume': 700,
+    'cover_letter': 900,
+    'portfolio': 350,
+}
+
+# Rough characters-per-token ratio for English text when tiktoken is missing
+_CHARS_PER_TOKEN = 4
+
+
+# Set once loading an encoding failed (e.g. no network to download it), so the
+# estimate is used from then on instead of retrying on every call
+_encoding_failed = False
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    """Returns the tiktoken encoding for `model`, or None if it is unavailable.
+
+    tiktoken is imported on first use so app startup does not pay for it.
+    None (the character-based estimate) is also used when the encoding file
+    cannot be loaded, e.g. on a host without network access.
+    """
+    global _encoding_failed
+    if _encoding_failed:
+        return None
+    try:
+        tiktoken = timed_import("tiktoken")
+    except ImportError:  # Fall back to a character-based estimate
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        _encoding_failed = True
+        logger.warning("Could not load the tiktoken encoding for %s (%s); "
+                       "token counts are estimated from the text length.", model, e)
+        return None
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Returns the number of tokens in `text` (estimated if tiktoken is unavailable)."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text, max_tokens, model="gpt-3.5-turbo"):
+    """Cuts `text` down to at most `max_tokens` tokens, marking the cut with an ellipsis."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max(max_tokens - 1, 0) * _CHARS_PER_TOKEN].rstrip() + "…"
+    return encoding.decode(encoding.encode(text)[:max(max_tokens - 1, 0)]).rstrip() + "…"
+
+
+def fit_entries(entries, budget_tokens, model="gpt-3.5-turbo"):
+    """Trims a list of prompt entries (e.g. project descriptions) to a token budget.
+
+    Overlong entries are truncated first; if the list still does not fit,
+    entries are dropped from the end. Returns `(entries, trimmed)`.
+    """
+    per_entry_cap = max(int(budget_tokens * MAX_PROJECT_SHARE), 1)
+    fitted = []
+    trimmed = False
+    used = 0
+    for entry in entries:
+        short_entry = truncate_to_tokens(entry, per_entry_cap, model)
+        trimmed = trimmed or short_entry != entry
+        # "; " separators cost about one token each
+        cost = count_tokens(short_entry, model) + 1
+        if used + cost > budget_tokens:
+            return fitted, True
+        fitted.append(short_entry)
+        used += cost
+    return fitted, trimmed
+
+
+def document_max_tokens(max_tokens_cap, per_document=True):
+    """Returns `{name: max_tokens}` for each document.
+
+    With `per_document`, each document gets its own size from
+    DOCUMENT_MAX_TOKENS, never more than `max_tokens_cap`; otherwise every
+    document gets the cap.
+    """
+    if not per_document:
+        return {name: max_tokens_cap for name in DOCUMENT_MAX_TOKENS}
+    return {name: min(max_tokens_cap, size) for name, size in DOCUMENT_MAX_TOKENS.items()}
+
+
+def estimate_usage(prompts, max_tokens, model="gpt-3.5-turbo"):
+    """Returns `{name: (prompt_tokens, max_completion_tokens)}` for a set of prompts."""
+    return {name: (count_tokens(prompt, model), max_tokens[name]) for name, prompt in prompts.items()}